@@ -1,29 +1,36 @@
-from flask import Flask, render_template, request, redirect, url_for
-import pyodbc
+from flask import Flask, render_template, request, redirect, url_for, abort
 from datetime import datetime
 import qrcode
 import io
 import base64
+import os
+import sys
+
+# Share the campus-aware connection router with the dashboard (db.py in the parent folder)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import create_connection, campus_names, default_campus
+from queries import execute, fetchall, fetchone
+from campus_networks import NetworkConfigError, address_allowed, pack_address
 
 app = Flask(__name__)
 
-# Database configuration
-DB_CONFIG = {
-    'Driver': '{SQL Server}',
-    'Server': 'your_server_name',
-    'Database': 'School_Grading_and_Attendance_System_DB',
-    'Trusted_Connection': 'yes'
-}
+# Campus comes from the ?campus= query string (or the form's hidden field) and picks the database
+def request_campus():
+    campus = request.values.get('campus') or default_campus()
+    if campus not in campus_names():
+        abort(404, description=f"Unknown campus: {campus}")
+    return campus
 
-def get_db_connection():
-    conn_str = ';'.join(f"{k}={v}" for k, v in DB_CONFIG.items())
-    return pyodbc.connect(conn_str)
+def get_db_connection(campus):
+    return create_connection(campus)
 
 @app.route('/')
 def index():
+    campus = request_campus()
+
     # Generate QR code
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(url_for('attendance_form', _external=True))
+    qr.add_data(url_for('attendance_form', campus=campus, _external=True))
     qr.make(fit=True)
     qr_img = qr.make_image(fill_color="black", back_color="white")
     
@@ -36,44 +43,44 @@ def index():
 
 @app.route('/form')
 def attendance_form():
+    campus = request_campus()
+
     # Get list of classes from database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT class_id, class_name FROM Classes")
-    classes = cursor.fetchall()
+    conn = get_db_connection(campus)
+    classes = fetchall(conn, "classes.options")
     conn.close()
     
-    return render_template('form.html', classes=classes)
+    return render_template('form.html', classes=classes, campus=campus)
 
 @app.route('/submit', methods=['POST'])
 def submit_attendance():
+    campus = request_campus()
+    # Scans must come from the campus network; checked before touching the database
+    try:
+        allowed = address_allowed(campus, request.remote_addr)
+        ip_address = pack_address(request.remote_addr)
+    except NetworkConfigError:
+        abort(503, description="Check-in is unavailable until the campus network list is fixed")
+    except ValueError:
+        abort(400, description="Unrecognised client address")
+    if not allowed:
+        abort(403, description="Attendance can only be submitted from the campus network")
     try:
         student_id = request.form['student_id']
         class_id = request.form['class_id']
-        ip_address = request.remote_addr
         
         # Verify student exists
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        conn = get_db_connection(campus)
         
-        cursor.execute("SELECT 1 FROM Students WHERE student_id = ?", student_id)
-        if not cursor.fetchone():
+        if not fetchone(conn, "students.exists", (student_id,)):
             return "Invalid student ID", 400
             
         # Check if attendance already recorded for today
-        cursor.execute("""
-            SELECT 1 FROM Attendance 
-            WHERE student_id = ? AND class_id = ? AND date = CAST(GETDATE() AS DATE)
-        """, student_id, class_id)
-        
-        if cursor.fetchone():
+        if fetchone(conn, "attendance.exists_today", (student_id, class_id)):
             return "Attendance already recorded for today", 400
             
         # Insert attendance record
-        cursor.execute("""
-            INSERT INTO Attendance (student_id, class_id, status, ip_address)
-            VALUES (?, ?, 'Present', ?)
-        """, student_id, class_id, ip_address)
+        execute(conn, "attendance.check_in", (student_id, class_id, ip_address))
         
         conn.commit()
         conn.close()
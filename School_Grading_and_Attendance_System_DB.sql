@@ -31,14 +31,160 @@ CREATE TABLE Attendance (
     class_id INT FOREIGN KEY REFERENCES Classes(class_id),
     date DATE DEFAULT GETDATE(),
     status NVARCHAR(10) CHECK (status IN ('Present', 'Absent', 'Late')),
-    ip_address NVARCHAR(15) NULL
+    ip_address VARBINARY(16) NULL  -- 4 bytes (IPv4) or 16 bytes (IPv6), see campus_networks.py
 );
 
 
+-- Grade scales map letters (with +/-) to the numeric points stored in Grades
+CREATE TABLE GradeScales (
+    scale_id INT PRIMARY KEY,
+    scale_name NVARCHAR(50) NOT NULL
+);
+
+CREATE TABLE GradeScaleBands (
+    scale_id INT FOREIGN KEY REFERENCES GradeScales(scale_id),
+    letter NVARCHAR(2) NOT NULL,
+    points TINYINT NOT NULL,       -- Points stored when a grade is entered as this letter
+    min_points TINYINT NOT NULL,   -- Lowest points that still read back as this letter
+    max_points TINYINT NOT NULL,   -- Highest points that still read back as this letter
+    PRIMARY KEY (scale_id, letter)
+);
+
+INSERT INTO GradeScales (scale_id, scale_name) VALUES (1, 'Standard (+/-)');
+
+-- Plain A-F keep the points the old letter-based reports used (A=95 ... F=55)
+INSERT INTO GradeScaleBands (scale_id, letter, points, min_points, max_points) VALUES
+    (1, 'A+', 98, 97, 100),
+    (1, 'A',  95, 93, 96),
+    (1, 'A-', 91, 90, 92),
+    (1, 'B+', 88, 87, 89),
+    (1, 'B',  85, 83, 86),
+    (1, 'B-', 81, 80, 82),
+    (1, 'C+', 78, 77, 79),
+    (1, 'C',  75, 73, 76),
+    (1, 'C-', 71, 70, 72),
+    (1, 'D+', 68, 67, 69),
+    (1, 'D',  65, 63, 66),
+    (1, 'D-', 61, 60, 62),
+    (1, 'F',  55, 0, 59);
+
 CREATE TABLE Grades (
     grade_id INT PRIMARY KEY IDENTITY(1,1),   -- Automatically generates unique values starting from 1
     student_id INT FOREIGN KEY REFERENCES Students(student_id),
     class_id INT FOREIGN KEY REFERENCES Classes(class_id),
-    grade NVARCHAR(5) CHECK (grade IN ('A', 'B', 'C', 'D', 'F')),  -- Restrict grades to A, B, C, D, F
+    scale_id INT NOT NULL DEFAULT 1 FOREIGN KEY REFERENCES GradeScales(scale_id),
+    points TINYINT CONSTRAINT CK_Grades_points CHECK (points BETWEEN 0 AND 100),  -- Numeric grade; the letter comes from GradeScaleBands
     date_assigned DATE DEFAULT GETDATE()  -- Default the date to current date if not provided
 );
+
+-- Narrow indexes so averages and threshold filters read points without touching the base table
+CREATE INDEX IX_Grades_student_points ON Grades (student_id) INCLUDE (points);
+CREATE INDEX IX_Grades_class_points ON Grades (class_id) INCLUDE (points);
+CREATE INDEX IX_Grades_points ON Grades (points) INCLUDE (student_id);
+
+-- Written by risk_scoring.py; one row per student, replaced on every run
+CREATE TABLE StudentRiskScores (
+    student_id INT PRIMARY KEY FOREIGN KEY REFERENCES Students(student_id),
+    attendance_rate FLOAT NULL,     -- Share of Present records in the scoring window
+    absence_streak INT NOT NULL,    -- Days absent in a row up to the latest school day
+    grade_slope FLOAT NOT NULL,     -- Points gained (+) or lost (-) per week
+    risk_score FLOAT NOT NULL,      -- 0 (no risk) to 100
+    computed_at DATETIME2 NOT NULL
+);
+
+CREATE INDEX IX_StudentRiskScores_risk ON StudentRiskScores (risk_score DESC);
+
+-- Change tracking lets the dashboard fetch only rows changed since its last refresh
+ALTER DATABASE School_Grading_and_Attendance_System_DB
+    SET CHANGE_TRACKING = ON (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON);
+
+ALTER TABLE Students ENABLE CHANGE_TRACKING;
+ALTER TABLE Classes ENABLE CHANGE_TRACKING;
+ALTER TABLE Grades ENABLE CHANGE_TRACKING;
+ALTER TABLE Attendance ENABLE CHANGE_TRACKING;
+
+GO
+
+-- Terms are closed by archive_terms.py, which moves their Attendance and Grades rows
+-- into the archive tables so the hot tables only hold the current term
+CREATE TABLE Terms (
+    term_id INT PRIMARY KEY,
+    term_name NVARCHAR(50) NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    archived_at DATETIME2 NULL
+);
+
+-- Same columns as the hot tables, without IDENTITY, foreign keys or CHECKs:
+-- rows are moved with DELETE ... OUTPUT INTO, whose target cannot have them
+CREATE TABLE Attendance_Archive (
+    attendance_id INT PRIMARY KEY,
+    student_id INT,
+    class_id INT,
+    date DATE,
+    status NVARCHAR(10),
+    ip_address VARBINARY(16) NULL
+);
+
+CREATE TABLE Grades_Archive (
+    grade_id INT PRIMARY KEY,
+    student_id INT,
+    class_id INT,
+    scale_id INT NOT NULL,
+    points TINYINT,
+    date_assigned DATE
+);
+
+CREATE INDEX IX_Attendance_date ON Attendance (date);
+CREATE INDEX IX_Attendance_student_class_date ON Attendance (student_id, class_id, date);
+CREATE INDEX IX_Grades_date_assigned ON Grades (date_assigned);
+CREATE INDEX IX_Attendance_Archive_student_date ON Attendance_Archive (student_id, date);
+CREATE INDEX IX_Grades_Archive_student ON Grades_Archive (student_id) INCLUDE (points);
+GO
+
+-- Hot and archived rows together, for the dashboard's "include history" option
+CREATE VIEW Attendance_History AS
+    SELECT attendance_id, student_id, class_id, date, status, ip_address FROM Attendance
+    UNION ALL
+    SELECT attendance_id, student_id, class_id, date, status, ip_address FROM Attendance_Archive;
+GO
+
+CREATE VIEW Grades_History AS
+    SELECT grade_id, student_id, class_id, scale_id, points, date_assigned FROM Grades
+    UNION ALL
+    SELECT grade_id, student_id, class_id, scale_id, points, date_assigned FROM Grades_Archive;
+GO
+
+-- Advanced once a second by the heartbeat writer in db.py; the copy on a read replica shows how far behind it is
+CREATE TABLE ReplicaHeartbeat (
+    id INT PRIMARY KEY,
+    beat BIGINT NOT NULL   -- Epoch milliseconds of the latest heartbeat
+);
+
+INSERT INTO ReplicaHeartbeat (id, beat) VALUES (1, 0);
+GO
+
+-- Guardians contacted by absence_notifications.py
+CREATE TABLE Guardians (
+    guardian_id INT PRIMARY KEY IDENTITY(1,1),
+    student_id INT NOT NULL FOREIGN KEY REFERENCES Students(student_id),
+    guardian_name NVARCHAR(100) NOT NULL,
+    email NVARCHAR(254) NULL
+);
+
+CREATE INDEX IX_Guardians_student ON Guardians (student_id) INCLUDE (guardian_name, email);
+
+-- One row per student, day and channel: claimed before sending, so a student
+-- is notified at most once a day even when the job runs after every period
+CREATE TABLE NotificationLog (
+    student_id INT NOT NULL,
+    notify_date DATE NOT NULL,
+    channel NVARCHAR(20) NOT NULL,
+    status NVARCHAR(10) NOT NULL CHECK (status IN ('sending', 'sent')),
+    recipients INT NOT NULL,
+    updated_at DATETIME2 NOT NULL,   -- Claimed at while 'sending', delivered at once 'sent'
+    PRIMARY KEY (notify_date, channel, student_id)
+);
+
+CREATE INDEX IX_Attendance_date_status ON Attendance (date, status) INCLUDE (student_id, class_id);
+GO
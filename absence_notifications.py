@@ -0,0 +1,234 @@
+"""Email guardians of students marked Absent or Late on a school day.
+
+One set-based query finds every absent or late student of the day who has
+not been notified yet, joined to their guardians. The students are claimed
+in NotificationLog (one row per student, day and channel) before anything
+is sent, so running the job after every period notifies each student at
+most once a day. Messages then fan out through an asyncio worker queue:
+workers take batches (one SMTP session per batch), a per-channel semaphore
+caps concurrent sessions, and failed messages are retried with backoff.
+
+    python absence_notifications.py                        # today
+    python absence_notifications.py --date 2025-03-14 --campus north
+    python absence_notifications.py --dry-run              # print, send nothing
+
+SMTP settings come from SMS_SMTP_HOST / SMS_SMTP_PORT / SMS_SMTP_USER /
+SMS_SMTP_PASSWORD / SMS_SMTP_STARTTLS / SMS_SMTP_FROM. For local testing,
+run an SMTP stand-in such as `python -m aiosmtpd -n -l localhost:1025` and
+set SMS_SMTP_PORT=1025.
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+from email.message import EmailMessage
+
+import pyodbc
+
+from db import create_connection, close_connection
+from queries import execute, executemany, fetchall
+
+
+SMTP_HOST = os.environ.get("SMS_SMTP_HOST", "localhost")
+SMTP_PORT = int(os.environ.get("SMS_SMTP_PORT", "25"))
+SMTP_USER = os.environ.get("SMS_SMTP_USER")
+SMTP_PASSWORD = os.environ.get("SMS_SMTP_PASSWORD")
+SMTP_STARTTLS = os.environ.get("SMS_SMTP_STARTTLS", "").lower() in ("1", "true", "yes")
+SMTP_FROM = os.environ.get("SMS_SMTP_FROM", "attendance@school.example")
+
+# Queue workers shared by all channels; each channel caps its own concurrency
+WORKERS = 8
+
+MAX_ATTEMPTS = 3
+
+# Seconds before the first retry, doubled after each further failure
+RETRY_DELAY = 2.0
+
+# A 'sending' claim older than this belongs to a run that died; it is released and retried
+STALE_CLAIM_MINUTES = 15
+
+# recipients: [(guardian name, email), ...]
+Notification = namedtuple("Notification", ["student_id", "student_name", "recipients", "absent_classes", "late_classes"])
+
+
+def build_notifications(rows):
+    """One notification per student from the per-guardian rows of notifications.pending."""
+    notifications = {}
+    for student_id, first_name, last_name, absent_classes, late_classes, guardian_name, email in rows:
+        if student_id not in notifications:
+            notifications[student_id] = Notification(student_id, f"{first_name} {last_name}", [],
+                                                     absent_classes, late_classes)
+        notifications[student_id].recipients.append((guardian_name, email))
+    return list(notifications.values())
+
+
+class SmtpChannel:
+    name = "email"
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, sender=SMTP_FROM, concurrency=4, batch_size=50):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._limit = None
+
+    def compose(self, notification, day):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = ", ".join(email for _, email in notification.recipients)
+        message["Subject"] = f"Attendance notice for {notification.student_name}, {day:%A %d %B %Y}"
+        lines = [f"Dear {' and '.join(name for name, _ in notification.recipients)},", ""]
+        if notification.absent_classes:
+            lines.append(f"{notification.student_name} was marked absent from: {notification.absent_classes}.")
+        if notification.late_classes:
+            lines.append(f"{notification.student_name} arrived late to: {notification.late_classes}.")
+        lines += ["", "If you believe this is a mistake, please contact the school office."]
+        message.set_content("\n".join(lines))
+        return message
+
+    # Blocking; runs in a worker thread. One SMTP session per batch, and a
+    # refused message does not stop the rest of the batch. Once the session is
+    # up, every message gets its own outcome: if the connection drops midway,
+    # the messages the server already accepted still count as sent and only
+    # the rest are retried
+    def _send_batch(self, messages):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        errors = []
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            for message in messages:
+                try:
+                    smtp.send_message(message)
+                    errors.append(None)
+                except (smtplib.SMTPException, OSError) as e:
+                    errors.append(e)
+        finally:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+        return errors
+
+    async def send_batch(self, messages):
+        """Send a batch; returns one error (or None) per message."""
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)
+        async with self._limit:
+            return await asyncio.to_thread(self._send_batch, messages)
+
+
+async def dispatch(notifications, channel, day, workers=WORKERS):
+    """Send every notification through `channel`; returns (sent, [(notification, error), ...])."""
+    queue = asyncio.Queue()
+    for notification in notifications:
+        queue.put_nowait((notification, 1))
+    sent, failed = [], []
+
+    async def worker():
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < channel.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                errors = await channel.send_batch([channel.compose(n, day) for n, _ in batch])
+            except Exception as e:
+                # Connection or login failure: nothing in the batch went out
+                errors = [e] * len(batch)
+
+            retries = []
+            for (notification, attempt), error in zip(batch, errors):
+                if error is None:
+                    sent.append(notification)
+                elif attempt < MAX_ATTEMPTS:
+                    retries.append((notification, attempt + 1))
+                else:
+                    failed.append((notification, error))
+            if retries:
+                await asyncio.sleep(RETRY_DELAY * 2 ** (max(a for _, a in retries) - 2))
+                for item in retries:
+                    queue.put_nowait(item)
+            # Retries are queued before the batch is marked done, so join() cannot return early
+            for _ in batch:
+                queue.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    await queue.join()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return sent, failed
+
+
+def run(day, campus=None, channel=None, dry_run=False):
+    channel = channel or SmtpChannel()
+    conn = create_connection(campus)
+    try:
+        execute(conn, "notifications.release_stale", (day, channel.name, STALE_CLAIM_MINUTES))
+        notifications = build_notifications(fetchall(conn, "notifications.pending", (day, day, channel.name)))
+        if dry_run:
+            # The preview lists abandoned claims as pending but writes nothing
+            conn.rollback()
+            return notifications, [], []
+        conn.commit()
+        if not notifications:
+            return notifications, [], []
+
+        # Claimed in one transaction: if another run got to any of these students
+        # first, the primary key rejects the whole claim and nothing is sent twice
+        try:
+            executemany(conn, "notifications.claim",
+                        [(n.student_id, day, channel.name, len(n.recipients)) for n in notifications])
+            conn.commit()
+        except (pyodbc.IntegrityError, sqlite3.IntegrityError) as e:
+            conn.rollback()
+            raise RuntimeError("Another notification run claimed some of these students; try again shortly") from e
+        except Exception:
+            conn.rollback()
+            raise
+
+        sent, failed = asyncio.run(dispatch(notifications, channel, day))
+
+        # Failed claims are released so the next run tries them again
+        if sent:
+            executemany(conn, "notifications.mark_sent", [(n.student_id, day, channel.name) for n in sent])
+        if failed:
+            executemany(conn, "notifications.release", [(n.student_id, day, channel.name) for n, _ in failed])
+        conn.commit()
+    finally:
+        close_connection(conn)
+    return notifications, sent, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Email guardians of students marked Absent or Late.")
+    parser.add_argument("--date", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        default=datetime.now().date(), help="school day to notify for (YYYY-MM-DD, default: today)")
+    parser.add_argument("--campus", default=None, help="campus to run against (default: the configured default campus)")
+    parser.add_argument("--dry-run", action="store_true", help="print the pending notifications without sending")
+    args = parser.parse_args()
+
+    channel = SmtpChannel()
+    notifications, sent, failed = run(args.date, args.campus, channel, args.dry_run)
+    if args.dry_run:
+        for n in notifications:
+            print(channel.compose(n, args.date))
+        print(f"{len(notifications)} students pending for {args.date}.")
+        return
+    print(f"Notified guardians of {len(sent)} students for {args.date}; {len(failed)} failed.")
+    for notification, error in failed:
+        print(f"  {notification.student_id} {notification.student_name}: {error}")
+
+
+if __name__ == "__main__":
+    main()
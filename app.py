@@ -1,35 +1,93 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import pyodbc
 import logging
 import warnings
 import matplotlib.pyplot as plt
+from db import create_connection, close_connection, campus_names, default_campus, merge_partials
+from queries import execute, fetchall, fetchone, frame, gather
+from delta_cache import DeltaView
+from attendance_streaks import streak_summary
+from profiler import PROFILE_ENABLED, profile_rerun, profile_section
+from bulk_import import (
+    load_reference, validate_grades, validate_attendance,
+    import_grades, import_attendance, rejected_report_name
+)
 
 
 logging.getLogger().setLevel(logging.ERROR)
 warnings.filterwarnings("ignore", message="missing ScriptRunContext!")
 
-# Database connection
-def create_connection():
-    return pyodbc.connect(
-        'DRIVER={ODBC Driver 17 for SQL Server};'
-        'SERVER=localhost;'
-        'DATABASE=School_Grading_and_Attendance_System_DB;'
-        'Trusted_Connection=yes;'
-    )
-
-# Connection closure function
-def close_connection(conn):
-    if conn:
-        conn.close()
+# Read views refreshed from change tracking: only rows changed since the last render are fetched
+STUDENTS_VIEW = DeltaView("students", key="student_id")
+GRADES_VIEW = DeltaView("grades", key="Grade ID")
+ATTENDANCE_VIEW = DeltaView("attendance", key="Attendance ID")
 
 # Initialize Streamlit app
 st.set_page_config(page_title="School Management System", layout="wide")
 
+# Campus picked in the sidebar; every connection in the dashboard goes to its database
+def current_campus():
+    return st.session_state.get("campus") or default_campus()
+
+# Per-campus store for the delta-refreshed views
+def delta_store():
+    return st.session_state.setdefault(f"delta_cache:{current_campus()}", {})
+
+# Student/class/teacher ID sets and grade bands that bulk imports are validated against;
+# cleared after every add or delete of a student, teacher or class
+@st.cache_data(ttl=300)
+def load_reference_sets(campus):
+    conn = create_connection(campus, role="read")
+    try:
+        return load_reference(conn)
+    finally:
+        close_connection(conn)
+
+# Bulk CSV upload for Grades and Attendance
+def bulk_import_section(table, validate, importer, key):
+    st.markdown("---")
+    st.subheader(f"Bulk Upload {table}")
+
+    uploaded_file = st.file_uploader("Upload a CSV File", type=["csv"], key=key)
+    if uploaded_file:
+        try:
+            df = pd.read_csv(uploaded_file)
+            reference = load_reference_sets(current_campus())
+            rows, rejected = validate(df, reference)
+            st.write(f"{len(rows)} valid rows, {len(rejected)} rejected. Preview:")
+            st.dataframe(rows.head(100))
+
+            if st.button(f"Insert {table}", key=f"{key}_insert"):
+                conn = create_connection(current_campus())
+                try:
+                    result = importer(conn, df, reference)
+                    rejected = result.rejected
+                    st.success(f"Inserted {result.inserted} {table.lower()} rows.")
+                except Exception as e:
+                    st.error(f"Error during bulk upload: {str(e)}")
+                finally:
+                    close_connection(conn)
+
+            if not rejected.empty:
+                st.warning(f"{len(rejected)} rows were rejected.")
+                st.dataframe(rejected)
+                st.download_button(
+                    "Download Rejected Rows",
+                    rejected.to_csv(index=False),
+                    file_name=rejected_report_name(table),
+                    mime="text/csv",
+                    key=f"{key}_rejected"
+                )
+        except Exception as e:
+            st.error(f"Error reading file: {str(e)}")
+
 # Sidebar navigation
 def sidebar_menu():
     st.sidebar.title("Navigation")
+    campuses = campus_names()
+    if len(campuses) > 1:
+        st.sidebar.selectbox("Campus", campuses, index=campuses.index(default_campus()), key="campus")
     return st.sidebar.radio(
         "Select Operation:",
         ["Students", "Teachers", "Classes", "Grades", "Attendance", "Advanced Queries"]
@@ -53,15 +111,12 @@ def student_crud():
             enrollment_date = st.date_input("Enrollment Date", min_value=datetime(1900, 1, 1).date(), key="enrollment_date_input")
             
             if st.form_submit_button("Add Student"):
-                conn = create_connection()
-                cursor = conn.cursor()
+                conn = create_connection(current_campus())
                 try:
-                    cursor.execute(""" 
-                        INSERT INTO Students (student_id, first_name, last_name, dob, gender, enrollment_date) 
-                        VALUES (?, ?, ?, ?, ?, ?) 
-                    """, (student_id, first_name, last_name, dob, gender, enrollment_date))
+                    execute(conn, "students.insert", (student_id, first_name, last_name, dob, gender, enrollment_date))
                     conn.commit()
                     st.success("Student added successfully!")
+                    load_reference_sets.clear()
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
                 finally:
@@ -97,10 +152,8 @@ def student_crud():
                 df['enrollment_date'] = pd.to_datetime(df['enrollment_date']).dt.date  # Ensure DATE type
 
                 # Get existing student_ids from the database
-                conn = create_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT student_id FROM Students")
-                existing_ids = [row[0] for row in cursor.fetchall()]
+                conn = create_connection(current_campus())
+                existing_ids = [row[0] for row in fetchall(conn, "students.ids")]
                 conn.close()
 
                 # Filter out the students that already exist in the database
@@ -114,17 +167,14 @@ def student_crud():
 
                     # Insert only the unique students that do not exist in the database
                     if st.button("Insert Students"):
-                        conn = create_connection()
-                        cursor = conn.cursor()
+                        conn = create_connection(current_campus())
                         try:
                             for _, row in df_filtered.iterrows():
-                                cursor.execute(""" 
-                                    INSERT INTO Students (student_id, first_name, last_name, dob, gender, enrollment_date) 
-                                    VALUES (?, ?, ?, ?, ?, ?) 
-                                """, (row['student_id'], row['first_name'], row['last_name'], 
+                                execute(conn, "students.insert", (row['student_id'], row['first_name'], row['last_name'], 
                                     row['dob'], row['gender'], row['enrollment_date']))
                             conn.commit()
                             st.success("Students uploaded successfully!")
+                            load_reference_sets.clear()
                         except Exception as e:
                             st.error(f"Error during bulk upload: {str(e)}")
                         finally:
@@ -135,17 +185,12 @@ def student_crud():
  
     with tab2:
         st.subheader("View Students")
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus(), role="read")
         try:
-            cursor.execute("SELECT * FROM Students")
-            result = cursor.fetchall()
+            df = STUDENTS_VIEW.fetch(conn, delta_store())
             
             # Check if result contains any rows
-            if result:
-                columns = [column[0] for column in cursor.description]  # Extract column names
-                formatted_result = [list(row) for row in result]  # Ensure rows are lists
-                df = pd.DataFrame(formatted_result, columns=columns)  # Create DataFrame with columns
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.info("No students found in the database.")
@@ -156,10 +201,8 @@ def student_crud():
             
     with tab3:
         st.subheader("Update Student")
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT student_id, first_name, last_name FROM Students")
-        students = cursor.fetchall()
+        conn = create_connection(current_campus())
+        students = fetchall(conn, "students.options")
 
         student_id = st.selectbox("Select Student", 
                                 options=[f"{s[0]} - {s[1]} {s[2]}" for s in students],
@@ -168,8 +211,7 @@ def student_crud():
 
         if student_id:
             student_id = int(student_id.split(" - ")[0])
-            cursor.execute("SELECT * FROM Students WHERE student_id = ?", (student_id,))
-            student_data = cursor.fetchone()
+            student_data = fetchone(conn, "students.get", (student_id,))
 
             with st.form("update_student"):
                 new_first_name = st.text_input("First Name", value=student_data[1], key="update_first_name")
@@ -179,11 +221,7 @@ def student_crud():
 
                 if st.form_submit_button("Update Student"):
                     try:
-                        cursor.execute("""
-                            UPDATE Students 
-                            SET first_name=?, last_name=?, dob=?, gender=? 
-                            WHERE student_id=?
-                        """, (new_first_name, new_last_name, new_dob, new_gender, student_id))
+                        execute(conn, "students.update", (new_first_name, new_last_name, new_dob, new_gender, student_id))
                         conn.commit()
                         st.success("Student updated successfully!")
                     except Exception as e:
@@ -192,11 +230,9 @@ def student_crud():
 
     with tab4:
         st.subheader("Delete Student")
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         
-        cursor.execute("SELECT student_id, first_name, last_name FROM Students")
-        students = cursor.fetchall()
+        students = fetchall(conn, "students.options")
         
         student_to_delete = st.selectbox(
             "Select Student to Delete",
@@ -208,9 +244,10 @@ def student_crud():
         if st.button("Delete Student"):
             try:
                 student_id = int(student_to_delete.split(" - ")[0])
-                cursor.execute("DELETE FROM Students WHERE student_id = ?", (student_id,))
+                execute(conn, "students.delete", (student_id,))
                 conn.commit()
                 st.success("Student deleted successfully!")
+                load_reference_sets.clear()
             except Exception as e:
                 st.error(f"Error: {str(e)}")
         
@@ -231,18 +268,15 @@ def teacher_crud():
             subject = st.text_input("Subject")
 
             if st.form_submit_button("Add Teacher"):
-                conn = create_connection()
-                cursor = conn.cursor()
+                conn = create_connection(current_campus())
                 try:
                     # Insert teacher details into the database
-                    cursor.execute("""
-                        INSERT INTO Teachers (teacher_id, first_name, last_name, subject) 
-                        VALUES (?, ?, ?, ?)
-                    """, (teacher_id, first_name, last_name, subject))
+                    execute(conn, "teachers.insert", (teacher_id, first_name, last_name, subject))
                     
                     # Commit transaction after data insertion
                     conn.commit()
                     st.success("Teacher added successfully!")
+                    load_reference_sets.clear()
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
                 finally:
@@ -253,17 +287,12 @@ def teacher_crud():
     # View Teachers
     with tab2:
         st.subheader("View Teachers")
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus(), role="read")
         try:
-            cursor.execute("SELECT * FROM Teachers")
-            result = cursor.fetchall()
+            df = frame(conn, "teachers.all")
             
             # Check if result contains any rows
-            if result:
-                columns = [column[0] for column in cursor.description]  # Extract column names
-                formatted_result = [list(row) for row in result]  # Ensure rows are lists
-                df = pd.DataFrame(formatted_result, columns=columns)  # Create DataFrame with columns
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.info("No teachers found in the database.")
@@ -276,19 +305,16 @@ def teacher_crud():
     # Update Teacher
     with tab3:
         st.subheader("Update Teacher")
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         try:
-            cursor.execute("SELECT teacher_id, first_name, last_name FROM Teachers")
-            teachers = cursor.fetchall()
+            teachers = fetchall(conn, "teachers.options")
             
             teacher_id_options = [f"{t[0]} - {t[1]} {t[2]}" for t in teachers]
             teacher_to_update = st.selectbox("Select Teacher to Update", teacher_id_options)
             
             if teacher_to_update:
                 teacher_id = int(teacher_to_update.split(" - ")[0])
-                cursor.execute("SELECT * FROM Teachers WHERE teacher_id = ?", (teacher_id,))
-                teacher_data = cursor.fetchone()
+                teacher_data = fetchone(conn, "teachers.get", (teacher_id,))
 
                 with st.form("update_teacher"):
                     new_first_name = st.text_input("First Name", value=teacher_data[1])
@@ -296,11 +322,7 @@ def teacher_crud():
                     new_subject = st.text_input("Subject", value=teacher_data[3])
 
                     if st.form_submit_button("Update Teacher"):
-                        cursor.execute("""
-                            UPDATE Teachers 
-                            SET first_name=?, last_name=?, subject=? 
-                            WHERE teacher_id=?
-                        """, (new_first_name, new_last_name, new_subject, teacher_id))
+                        execute(conn, "teachers.update", (new_first_name, new_last_name, new_subject, teacher_id))
                         conn.commit()
                         st.success("Teacher updated successfully!")
         except Exception as e:
@@ -311,20 +333,19 @@ def teacher_crud():
     # Delete Teacher
     with tab4:
         st.subheader("Delete Teacher")
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         try:
-            cursor.execute("SELECT teacher_id, first_name, last_name FROM Teachers")
-            teachers = cursor.fetchall()
+            teachers = fetchall(conn, "teachers.options")
 
             teacher_id_options = [f"{t[0]} - {t[1]} {t[2]}" for t in teachers]
             teacher_to_delete = st.selectbox("Select Teacher to Delete", teacher_id_options)
 
             if st.button("Delete Teacher"):
                 teacher_id = int(teacher_to_delete.split(" - ")[0])
-                cursor.execute("DELETE FROM Teachers WHERE teacher_id = ?", (teacher_id,))
+                execute(conn, "teachers.delete", (teacher_id,))
                 conn.commit()
                 st.success("Teacher deleted successfully!")
+                load_reference_sets.clear()
         except Exception as e:
             st.error(f"Error: {str(e)}")
         finally:
@@ -342,26 +363,21 @@ def class_crud():
         class_name = st.text_input("Class Name")
 
         # Fetch teacher list for assigning to class
-        conn = create_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT teacher_id, first_name, last_name FROM Teachers")
-        teachers = cursor.fetchall()
+        conn = create_connection(current_campus(), role="read")
+        teachers = fetchall(conn, "teachers.options")
         close_connection(conn)
 
         teacher_options = [f"{t[0]} - {t[1]} {t[2]}" for t in teachers]
         selected_teacher = st.selectbox("Select Teacher", teacher_options)
 
         if st.button("Add Class"):
-            conn = create_connection()
-            cursor = conn.cursor()
+            conn = create_connection(current_campus())
             try:
                 teacher_id = int(selected_teacher.split(" - ")[0])  # Extract teacher_id
-                cursor.execute("""
-                    INSERT INTO Classes (class_id, class_name, teacher_id)
-                    VALUES (?, ?, ?)
-                """, (class_id, class_name, teacher_id))
+                execute(conn, "classes.insert", (class_id, class_name, teacher_id))
                 conn.commit()
                 st.success("Class added successfully!")
+                load_reference_sets.clear()
             except Exception as e:
                 st.error(f"Error: {str(e)}")
             finally:
@@ -370,21 +386,12 @@ def class_crud():
     # View Classes
     with tab2:
         st.subheader("View Classes")
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus(), role="read")
         try:
-            cursor.execute("""
-                SELECT C.class_id, C.class_name, T.first_name, T.last_name
-                FROM Classes C
-                JOIN Teachers T ON C.teacher_id = T.teacher_id
-            """)
-            result = cursor.fetchall()
+            df = frame(conn, "classes.with_teachers")
             
             # Check if result contains any rows
-            if result:
-                columns = ['Class ID', 'Class Name', 'Teacher First Name', 'Teacher Last Name']
-                formatted_result = [list(row) for row in result]  # Ensure each row is a list
-                df = pd.DataFrame(formatted_result, columns=columns)
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.info("No classes found in the database.")
@@ -398,11 +405,9 @@ def class_crud():
         st.subheader("Update Class")
 
         # Fetch existing classes and teachers for selection
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         try:
-            cursor.execute("SELECT class_id, class_name FROM Classes")
-            classes = cursor.fetchall()
+            classes = fetchall(conn, "classes.options")
 
             # If there are classes, proceed with update form
             if classes:
@@ -410,24 +415,18 @@ def class_crud():
                 selected_class = st.selectbox("Select Class to Update", class_options)
                 selected_class_id = int(selected_class.split(" - ")[0])
 
-                cursor.execute("SELECT class_name, teacher_id FROM Classes WHERE class_id = ?", (selected_class_id,))
-                class_data = cursor.fetchone()
+                class_data = fetchone(conn, "classes.get", (selected_class_id,))
 
                 # Get updated class name and teacher list
                 new_class_name = st.text_input("Class Name", value=class_data[0])
-                cursor.execute("SELECT teacher_id, first_name, last_name FROM Teachers")
-                teachers = cursor.fetchall()
+                teachers = fetchall(conn, "teachers.options")
                 teacher_options = [f"{t[0]} - {t[1]} {t[2]}" for t in teachers]
                 selected_teacher = st.selectbox("Select New Teacher", teacher_options, index=[t[0] for t in teachers].index(class_data[1]))
 
                 if st.button("Update Class"):
                     new_teacher_id = int(selected_teacher.split(" - ")[0])
                     try:
-                        cursor.execute("""
-                            UPDATE Classes
-                            SET class_name = ?, teacher_id = ?
-                            WHERE class_id = ?
-                        """, (new_class_name, new_teacher_id, selected_class_id))
+                        execute(conn, "classes.update", (new_class_name, new_teacher_id, selected_class_id))
                         conn.commit()
                         st.success("Class updated successfully!")
                     except Exception as e:
@@ -444,11 +443,9 @@ def class_crud():
         st.subheader("Delete Class")
 
         # Fetch classes for deletion
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         try:
-            cursor.execute("SELECT class_id, class_name FROM Classes")
-            classes = cursor.fetchall()
+            classes = fetchall(conn, "classes.options")
 
             if classes:
                 class_options = [f"{c[0]} - {c[1]}" for c in classes]
@@ -457,9 +454,10 @@ def class_crud():
 
                 if st.button("Delete Class"):
                     try:
-                        cursor.execute("DELETE FROM Classes WHERE class_id = ?", (selected_class_id,))
+                        execute(conn, "classes.delete", (selected_class_id,))
                         conn.commit()
                         st.success("Class deleted successfully!")
+                        load_reference_sets.clear()
                     except Exception as e:
                         st.error(f"Error: {str(e)}")
             else:
@@ -480,13 +478,12 @@ def grade_crud():
         st.subheader("Add New Grade")
         
         # Fetch list of students and classes
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus(), role="read")
         try:
-            cursor.execute("SELECT student_id, first_name, last_name FROM Students")
-            students = cursor.fetchall()
-            cursor.execute("SELECT class_id, class_name FROM Classes")
-            classes = cursor.fetchall()
+            students = fetchall(conn, "students.options")
+            classes = fetchall(conn, "classes.options")
+            scales = fetchall(conn, "grade_scales.options")
+            bands = fetchall(conn, "grade_scales.bands")
         except Exception as e:
             st.error(f"Error fetching data: {str(e)}")
         finally:
@@ -497,44 +494,43 @@ def grade_crud():
         class_options = [f"{c[0]} - {c[1]}" for c in classes]
         selected_student = st.selectbox("Select Student", student_options)
         selected_class = st.selectbox("Select Class", class_options)
-        grade = st.text_input("Grade (e.g., A, B, C)")
+
+        # Grades are stored as points; the letter picked here is looked up in the chosen scale
+        scale_options = [f"{s[0]} - {s[1]}" for s in scales]
+        selected_scale = st.selectbox("Grade Scale", scale_options)
+        scale_id = int(selected_scale.split(" - ")[0])
+        scale_points = {b[1]: b[2] for b in bands if b[0] == scale_id}
+        letter = st.selectbox("Grade", list(scale_points))
         date_assigned = st.date_input("Date Assigned", datetime.now().date())
 
         if st.button("Add Grade"):
-            conn = create_connection()
-            cursor = conn.cursor()
+            conn = create_connection(current_campus())
             try:
                 student_id = int(selected_student.split(" - ")[0])
                 class_id = int(selected_class.split(" - ")[0])
-                cursor.execute("""
-                    INSERT INTO Grades (student_id, class_id, grade, date_assigned)
-                    VALUES (?, ?, ?, ?)
-                """, (student_id, class_id, grade, date_assigned))
+                execute(conn, "grades.insert", (student_id, class_id, scale_id, scale_points[letter], date_assigned))
                 conn.commit()
                 st.success("Grade added successfully!")
             except Exception as e:
                 st.error(f"Error adding grade: {str(e)}")
             finally:
                 close_connection(conn)
+
+        bulk_import_section("Grades", validate_grades, import_grades, key="bulk_upload_grades")
 # View Grades
     with tab2:
         st.subheader("View Grades")
-        conn = create_connection()
-        cursor = conn.cursor()
+        include_history = st.checkbox("Include history (archived terms)", key="view_grades_history")
+        conn = create_connection(current_campus(), role="read")
         try:
-            cursor.execute("""
-                SELECT G.grade_id, S.first_name, S.last_name, C.class_name, G.grade, G.date_assigned
-                FROM Grades G
-                JOIN Students S ON G.student_id = S.student_id
-                JOIN Classes C ON G.class_id = C.class_id
-            """)
-            result = cursor.fetchall()
+            if include_history:
+                # Archived rows are not change-tracked, so history is read directly
+                df = frame(conn, "grades.view", grades="Grades_History")
+            else:
+                df = GRADES_VIEW.fetch(conn, delta_store())
 
             # Check if result contains any rows
-            if result:
-                columns = ['Grade ID', 'Student First Name', 'Student Last Name', 'Class Name', 'Grade', 'Date Assigned']
-                formatted_result = [list(row) for row in result]
-                df = pd.DataFrame(formatted_result, columns=columns)
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.info("No grades found in the database.")
@@ -548,34 +544,27 @@ def grade_crud():
     with tab3:
         st.subheader("Update Grade")
 
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         try:
-            cursor.execute("SELECT grade_id, student_id, class_id, grade FROM Grades")
-            grades = cursor.fetchall()
-            
+            grades = fetchall(conn, "grades.options")
+
             if grades:
                 grade_options = [f"{g[0]} - Student ID: {g[1]}, Class ID: {g[2]}, Grade: {g[3]}" for g in grades]
                 selected_grade = st.selectbox("Select Grade to Update", grade_options)
                 selected_grade_id = int(selected_grade.split(" - ")[0])
 
-                cursor.execute("""
-                    SELECT student_id, class_id, grade, date_assigned
-                    FROM Grades
-                    WHERE grade_id = ?
-                """, (selected_grade_id,))
-                grade_data = cursor.fetchone()
+                grade_data = fetchone(conn, "grades.get", (selected_grade_id,))
+                bands = fetchall(conn, "grade_scales.bands_for_scale", (grade_data[2],))
 
-                new_grade = st.text_input("Grade", value=grade_data[2])
-                new_date_assigned = st.date_input("Date Assigned", value=grade_data[3])
+                letters = [b[0] for b in bands]
+                current = next((i for i, b in enumerate(bands) if grade_data[3] is not None and b[2] <= grade_data[3] <= b[3]), 0)
+                new_letter = st.selectbox("Grade", letters, index=current)
+                new_date_assigned = st.date_input("Date Assigned", value=grade_data[4])
 
                 if st.button("Update Grade"):
                     try:
-                        cursor.execute("""
-                            UPDATE Grades
-                            SET grade = ?, date_assigned = ?
-                            WHERE grade_id = ?
-                        """, (new_grade, new_date_assigned, selected_grade_id))
+                        new_points = bands[letters.index(new_letter)][1]
+                        execute(conn, "grades.update", (new_points, new_date_assigned, selected_grade_id))
                         conn.commit()
                         st.success("Grade updated successfully!")
                     except Exception as e:
@@ -589,11 +578,9 @@ def grade_crud():
     with tab4:
         st.subheader("Delete Grade")
 
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         try:
-            cursor.execute("SELECT grade_id, student_id, class_id, grade FROM Grades")
-            grades = cursor.fetchall()
+            grades = fetchall(conn, "grades.options")
 
             if grades:
                 grade_options = [f"{g[0]} - Student ID: {g[1]}, Class ID: {g[2]}, Grade: {g[3]}" for g in grades]
@@ -602,7 +589,7 @@ def grade_crud():
 
                 if st.button("Delete Grade"):
                     try:
-                        cursor.execute("DELETE FROM Grades WHERE grade_id = ?", (selected_grade_id,))
+                        execute(conn, "grades.delete", (selected_grade_id,))
                         conn.commit()
                         st.success("Grade deleted successfully!")
                     except Exception as e:
@@ -624,13 +611,10 @@ def attendance_management():
         st.subheader("Mark Attendance")
         
         # Fetch list of students and classes
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus(), role="read")
         try:
-            cursor.execute("SELECT student_id, first_name, last_name FROM Students")
-            students = cursor.fetchall()
-            cursor.execute("SELECT class_id, class_name FROM Classes")
-            classes = cursor.fetchall()
+            students = fetchall(conn, "students.options")
+            classes = fetchall(conn, "classes.options")
         except Exception as e:
             st.error(f"Error fetching data: {str(e)}")
         finally:
@@ -648,14 +632,10 @@ def attendance_management():
         date = st.date_input("Date", datetime.now().date(), key="mark_attendance_date")
 
         if st.button("Mark Attendance", key="mark_attendance_button"):
-            conn = create_connection()
-            cursor = conn.cursor()
+            conn = create_connection(current_campus())
             try:
                 student_id = int(selected_student.split(" - ")[0])
-                cursor.execute("""
-                    INSERT INTO Attendance (student_id, class_id, status, date)
-                    VALUES (?, ?, ?, ?)
-                """, (student_id, class_id, attendance_status, date))
+                execute(conn, "attendance.insert", (student_id, class_id, attendance_status, date))
                 conn.commit()
                 st.success("Attendance marked successfully!")
             except Exception as e:
@@ -663,32 +643,27 @@ def attendance_management():
             finally:
                 close_connection(conn)
 
+        bulk_import_section("Attendance", validate_attendance, import_attendance, key="bulk_upload_attendance")
+
     # View Attendance
     with tab2:
         st.subheader("View Attendance")
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus(), role="read")
 
         # Dropdown for selecting class
         class_options = [f"{c[0]} - {c[1]}" for c in classes]
         selected_class = st.selectbox("Select Class", class_options, key="view_attendance_class")
         class_id = int(selected_class.split(" - ")[0])
+        include_history = st.checkbox("Include history (archived terms)", key="view_attendance_history")
 
         try:
-            cursor.execute("""
-                SELECT A.attendance_id, S.first_name, S.last_name, C.class_name, A.status, A.date
-                FROM Attendance A
-                JOIN Students S ON A.student_id = S.student_id
-                JOIN Classes C ON A.class_id = C.class_id
-                WHERE C.class_id = ?
-            """, (class_id,))
-            result = cursor.fetchall()
+            if include_history:
+                df = frame(conn, "attendance.view_for_class", (class_id,), attendance="Attendance_History")
+            else:
+                df = ATTENDANCE_VIEW.fetch(conn, delta_store(), (class_id,))
 
             # Check if result contains any rows
-            if result:
-                columns = ['Attendance ID', 'Student First Name', 'Student Last Name', 'Class Name', 'Status', 'Date']
-                formatted_result = [list(row) for row in result]
-                df = pd.DataFrame(formatted_result, columns=columns)
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.info("No attendance records found for this class.")
@@ -701,34 +676,23 @@ def attendance_management():
     with tab3:
         st.subheader("Update Attendance")
 
-        conn = create_connection()
-        cursor = conn.cursor()
+        conn = create_connection(current_campus())
         try:
-            cursor.execute("SELECT attendance_id, student_id, class_id, status FROM Attendance")
-            attendance_records = cursor.fetchall()
+            attendance_records = fetchall(conn, "attendance.options")
             
             if attendance_records:
                 attendance_options = [f"{a[0]} - Student ID: {a[1]}, Class ID: {a[2]}, Status: {a[3]}" for a in attendance_records]
                 selected_attendance = st.selectbox("Select Attendance to Update", attendance_options, key="update_attendance_select")
                 selected_attendance_id = int(selected_attendance.split(" - ")[0])
 
-                cursor.execute("""
-                    SELECT student_id, class_id, status, date
-                    FROM Attendance
-                    WHERE attendance_id = ?
-                """, (selected_attendance_id,))
-                attendance_data = cursor.fetchone()
+                attendance_data = fetchone(conn, "attendance.get", (selected_attendance_id,))
 
                 new_status = st.selectbox("Status", options=["Present", "Absent"], index=["Present", "Absent"].index(attendance_data[2]), key="update_attendance_status")
                 new_date = st.date_input("Date", value=attendance_data[3], key="update_attendance_date")
 
                 if st.button("Update Attendance", key="update_attendance_button"):
                     try:
-                        cursor.execute("""
-                            UPDATE Attendance
-                            SET status = ?, date = ?
-                            WHERE attendance_id = ?
-                        """, (new_status, new_date, selected_attendance_id))
+                        execute(conn, "attendance.update", (new_status, new_date, selected_attendance_id))
                         conn.commit()
                         st.success("Attendance updated successfully!")
                     except Exception as e:
@@ -744,160 +708,87 @@ def advanced_queries():
     Discover insights into student performance, class efficiency, and attendance records. 
     Navigate through the tabs below to explore different analyses.
     """)
+
+    # Archived terms live in separate tables; the *_History views add them back in
+    include_history = st.checkbox("Include history (archived terms)", key="advanced_queries_history")
+    grades_table = "Grades_History" if include_history else "Grades"
+    attendance_table = "Attendance_History" if include_history else "Attendance"
+
+    # Across campuses each query runs on every shard in parallel; queries return
+    # sums and counts where needed so the partial results can be merged exactly
+    all_campuses = len(campus_names()) > 1 and st.checkbox("All campuses", key="advanced_queries_all_campuses")
     
     # Create tabs
     tabs = st.tabs([
         "Top Performing Students", "Class Performance", "Student Attendance Summary",
         "Underperforming Students", "Attendance Trends Over Time", "Class Enrollment Counts",
-        "Students with Consistent Attendance", "Class Performance Comparison Over Time"
+        "Students with Consistent Attendance", "Class Performance Comparison Over Time",
+        "At-Risk Students"
     ])
     
     # Establish database connection
-    conn = create_connection()
+    conn = create_connection(current_campus(), role="read")
     if not conn:
         st.error("Failed to connect to the database.")
         return  # Stop execution if connection fails
-    
-    cursor = conn.cursor()
+
+    def query(name, params=(), **tables):
+        if all_campuses:
+            return gather(name, params, **tables)
+        return frame(conn, name, params, **tables)
 
     try:
         # Example of executing a query (adjust for each tab)
-        with tabs[0]:
+        with tabs[0], profile_section("Top Performing Students"):
             st.subheader("Top Performing Students")
-            cursor.execute("""
-                SELECT TOP 10
-                    S.first_name, 
-                    S.last_name, 
-                    AVG(CASE grade 
-                        WHEN 'A' THEN 95
-                        WHEN 'B' THEN 85
-                        WHEN 'C' THEN 75
-                        WHEN 'D' THEN 65
-                        WHEN 'F' THEN 55
-                    END) AS average_grade
-                FROM Grades G
-                JOIN Students S ON G.student_id = S.student_id
-                GROUP BY S.first_name, S.last_name
-                ORDER BY average_grade DESC;
-            """)
-            result = cursor.fetchall()
-
-            if result:
-                result_data = [list(row) for row in result]
-                df = pd.DataFrame(result_data, columns=['First Name', 'Last Name', 'Average Grade'])
+            df = query("reports.top_students", grades=grades_table)
+            df = df.sort_values('Average Grade', ascending=False).head(10)
+
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.write("No top-performing students available.")
 
         # Class Performance
-        with tabs[1]:
+        with tabs[1], profile_section("Class Performance"):
             st.subheader("Class Performance")
-            cursor.execute("""
-                SELECT 
-                    C.class_name, 
-                    AVG(CASE grade 
-                        WHEN 'A' THEN 95
-                        WHEN 'B' THEN 85
-                        WHEN 'C' THEN 75
-                        WHEN 'D' THEN 65
-                        WHEN 'F' THEN 55
-                    END) AS average_grade
-                FROM Grades G
-                JOIN Classes C ON G.class_id = C.class_id
-                GROUP BY C.class_name
-                ORDER BY average_grade DESC;
-            """)
-            result = cursor.fetchall()
-            if result:
-                result_data = [list(row) for row in result]
-                df = pd.DataFrame(result_data, columns=['Class Name', 'Average Grade'])
+            df = query("reports.class_performance", grades=grades_table)
+            df = merge_partials(df, ['Class Name'], ['Points Sum', 'Grade Count'])
+            df['Average Grade'] = df['Points Sum'] / df['Grade Count']
+            df = df.sort_values('Average Grade', ascending=False)[['Class Name', 'Average Grade']]
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.write("No class performance data available.")
 
         # Student Attendance Summary
-        with tabs[2]:
+        with tabs[2], profile_section("Student Attendance Summary"):
             st.subheader("Student Attendance Summary")
-            cursor.execute("""
-                SELECT 
-                    S.first_name, 
-                    S.last_name, 
-                    COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS present_count,
-                    COUNT(A.attendance_id) AS total_classes,
-                    CASE 
-                        WHEN COUNT(A.attendance_id) > 0 THEN 
-                            (CAST(COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS FLOAT) / COUNT(A.attendance_id)) * 100 
-                        ELSE 0 
-                    END AS attendance_rate
-                FROM Students S
-                LEFT JOIN Attendance A ON S.student_id = A.student_id
-                GROUP BY S.first_name, S.last_name
-                ORDER BY attendance_rate DESC;
-            """)
-            result = cursor.fetchall()
-            if result:
-                result_data = [list(row) for row in result]
-                df = pd.DataFrame(result_data, columns=['First Name', 'Last Name', 'Present Count', 'Total Classes', 'Attendance Rate (%)'])
+            df = query("reports.attendance_summary", attendance=attendance_table)
+            df = df.sort_values('Attendance Rate (%)', ascending=False)
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.write("No attendance data available.")
 
         # Underperforming Students
-        with tabs[3]:
+        with tabs[3], profile_section("Underperforming Students"):
             st.subheader("Underperforming Students")
-            cursor.execute("""
-                SELECT 
-                    S.first_name, 
-                    S.last_name, 
-                    AVG(CASE grade 
-                        WHEN 'A' THEN 95
-                        WHEN 'B' THEN 85
-                        WHEN 'C' THEN 75
-                        WHEN 'D' THEN 65
-                        WHEN 'F' THEN 55
-                    END) AS average_grade
-                FROM Grades G
-                JOIN Students S ON G.student_id = S.student_id
-                GROUP BY S.first_name, S.last_name
-                HAVING AVG(CASE grade 
-                        WHEN 'A' THEN 95
-                        WHEN 'B' THEN 85
-                        WHEN 'C' THEN 75
-                        WHEN 'D' THEN 65
-                        WHEN 'F' THEN 55
-                    END) < 70
-                ORDER BY average_grade ASC;
-            """)
-            result = cursor.fetchall()
-            if result:
-                result_data = [list(row) for row in result]
-                df = pd.DataFrame(result_data, columns=['First Name', 'Last Name', 'Average Grade'])
+            df = query("reports.underperforming", grades=grades_table)
+            df = df.sort_values('Average Grade')
+            if not df.empty:
                 st.dataframe(df)
             else:
                 st.write("No underperforming students found.")
         
         # Attendance Trends Over Time
-        with tabs[4]:
+        with tabs[4], profile_section("Attendance Trends Over Time"):
             st.subheader("Attendance Trends Over Time")
-            cursor.execute("""
-                SELECT 
-                    DATEPART(month, A.date) AS month,
-                    COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS present_count,
-                    COUNT(A.attendance_id) AS total_classes,
-                    CASE 
-                        WHEN COUNT(A.attendance_id) > 0 THEN 
-                            (CAST(COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS FLOAT) / COUNT(A.attendance_id)) * 100
-                        ELSE 0 
-                    END AS attendance_rate
-                FROM Attendance A
-                GROUP BY DATEPART(month, A.date)
-                ORDER BY month;
-            """)
-            result = cursor.fetchall()
-
-            if result:
-                result_data = [list(row) for row in result]
-                df = pd.DataFrame(result_data, columns=['Month', 'Present Count', 'Total Classes', 'Attendance Rate (%)'])
+            df = query("reports.attendance_trends", attendance=attendance_table)
+            df = merge_partials(df, ['Month'], ['Present Count', 'Total Classes']).sort_values('Month')
+            df['Attendance Rate (%)'] = df['Present Count'] / df['Total Classes'] * 100
+
+            if not df.empty:
                 st.dataframe(df)
 
                 # Adding sliders for figure size customization
@@ -915,31 +806,85 @@ def advanced_queries():
             else:
                 st.write("No attendance trend data available.")
         
-        # Other queries (Class Enrollment Counts, Consistent Attendance, etc.) remain similar.
+        # Students with Consistent Attendance: one bulk fetch of day statuses,
+        # streaks found by run-length encoding in attendance_streaks.py
+        with tabs[6], profile_section("Students with Consistent Attendance"):
+            st.subheader("Students with Consistent Attendance")
+            today = datetime.now().date()
+            date_range = st.date_input("Date Range", value=(today.replace(month=1, day=1), today), key="streak_date_range")
+            min_streak = st.slider("Minimum Present Streak (days)", min_value=1, max_value=60, value=10, key="streak_min")
+            late_present = st.checkbox("Count Late as present", key="streak_late_present")
+            if len(date_range) == 2:
+                days = query("reports.day_statuses", date_range, attendance=attendance_table)
+                keys = ['Campus', 'student_id'] if all_campuses else ['student_id']
+                summary = streak_summary(days, keys, late_counts_as_present=late_present)
+                summary = summary[summary['longest_present'] >= min_streak].reset_index()
+                names = query("students.options")
+                df = summary.merge(names, on=keys).sort_values(['longest_present', 'consistency'], ascending=False)
+                df = df.rename(columns={
+                    'longest_present': 'Longest Present Streak', 'current_present': 'Current Present Streak',
+                    'absence_runs': 'Absence Runs', 'longest_absence': 'Longest Absence',
+                    'days': 'Days Recorded', 'consistency': 'Consistency (%)',
+                })
+                df = df[[*keys[:-1], 'First Name', 'Last Name', 'Longest Present Streak', 'Current Present Streak',
+                         'Absence Runs', 'Longest Absence', 'Days Recorded', 'Consistency (%)']]
+                if not df.empty:
+                    st.dataframe(df)
+                else:
+                    st.write("No students with a present streak of that length in this period.")
+            else:
+                st.write("Select a start and end date.")
+
+        # At-Risk Students (precomputed by risk_scoring.py)
+        with tabs[8], profile_section("At-Risk Students"):
+            st.subheader("At-Risk Students")
+            min_risk = st.slider("Minimum Risk Score", min_value=0, max_value=100, value=50)
+            df = query("reports.at_risk", (min_risk,))
+            df = df.sort_values('Risk Score', ascending=False)
+            if not df.empty:
+                st.caption(f"Last computed: {df['Computed At'].max()}")
+                st.dataframe(df.drop(columns=['Computed At']))
+            else:
+                st.write("No students at or above this risk score. Run `python risk_scoring.py` to refresh the scores.")
+
+        # Other queries (Class Enrollment Counts, etc.) remain similar.
 
     except Exception as e:
         st.error(f"An error occurred while executing the query: {str(e)}")
     finally:
-        cursor.close()
         conn.close()
 
+# Hottest frames of the last profiled rerun, with the flame-graph files it wrote
+def profile_panel(profiler):
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Profile")
+    st.sidebar.caption(f"{profiler.name}: {profiler.elapsed_ms:.0f} ms, {len(profiler.samples)} samples")
+    st.sidebar.dataframe(profiler.categories(), hide_index=True)
+    st.sidebar.dataframe(profiler.summary(), hide_index=True)
+    st.sidebar.caption("Saved " + ", ".join(f"`{path}`" for path in profiler.paths))
+
 def main():
     st.title("School Management System")
     
     menu_choice = sidebar_menu()
+    profiling = PROFILE_ENABLED or st.sidebar.toggle("Profile this page", key="profile")
     
-    if menu_choice == "Students":
-        student_crud()
-    elif menu_choice == "Teachers":
-        teacher_crud()
-    elif menu_choice == "Classes":
-        class_crud()
-    elif menu_choice == "Grades":
-        grade_crud()  
-    elif menu_choice == "Attendance":
-        attendance_management()
-    elif menu_choice == "Advanced Queries":
-        advanced_queries()
+    with profile_rerun(menu_choice, enabled=profiling) as profiler:
+        if menu_choice == "Students":
+            student_crud()
+        elif menu_choice == "Teachers":
+            teacher_crud()
+        elif menu_choice == "Classes":
+            class_crud()
+        elif menu_choice == "Grades":
+            grade_crud()  
+        elif menu_choice == "Attendance":
+            attendance_management()
+        elif menu_choice == "Advanced Queries":
+            advanced_queries()
+
+    if profiler:
+        profile_panel(profiler)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+"""Move closed terms out of the hot Attendance and Grades tables.
+
+Rows dated inside a term are moved to Attendance_Archive / Grades_Archive in
+batches, each batch a single DELETE ... OUTPUT INTO statement committed on
+its own, so the hot tables stay small and locks stay short. Archived rows
+remain visible through the Attendance_History and Grades_History views.
+
+    python archive_terms.py add 3 "Fall 2024" 2024-09-01 2025-01-31
+    python archive_terms.py list
+    python archive_terms.py archive 3
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from db import create_connection, close_connection
+from queries import execute, fetchall, fetchone
+
+
+BATCH_SIZE = 5000
+
+# (hot table, catalog query moving one batch of it into its archive table)
+ARCHIVED_TABLES = [
+    ("Attendance", "terms.archive_attendance"),
+    ("Grades", "terms.archive_grades"),
+]
+
+
+def move_rows(conn, table, query, start, end, batch_size=BATCH_SIZE):
+    moved = 0
+    try:
+        while True:
+            count = execute(conn, query, (batch_size, start, end))
+            conn.commit()
+            if count <= 0:
+                break
+            moved += count
+            print(f"\r{table}: moved {moved} rows", end="", file=sys.stderr)
+    except Exception:
+        conn.rollback()
+        raise
+    print(file=sys.stderr)
+    return moved
+
+
+def archive_term(conn, term_id, force=False, batch_size=BATCH_SIZE):
+    term = fetchone(conn, "terms.get", (term_id,))
+    if term is None:
+        raise ValueError(f"Unknown term {term_id}")
+    name, start, end = term
+    if end >= datetime.now().date() and not force:
+        raise ValueError(f"Term {name} ends on {end} and is not closed yet (use --force to archive anyway)")
+
+    moved = {}
+    for table, query in ARCHIVED_TABLES:
+        moved[table] = move_rows(conn, table, query, start, end, batch_size)
+
+    execute(conn, "terms.mark_archived", (term_id,))
+    conn.commit()
+    return name, moved
+
+
+def main():
+    def parse_date(s):
+        return datetime.strptime(s, "%Y-%m-%d").date()
+
+    parser = argparse.ArgumentParser(description="Archive closed terms out of the hot Attendance and Grades tables.")
+    parser.add_argument("--campus", default=None, help="campus to run against (default: the configured default campus)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="show terms and whether they are archived")
+
+    add = commands.add_parser("add", help="register a term")
+    add.add_argument("term_id", type=int)
+    add.add_argument("term_name")
+    add.add_argument("start_date", type=parse_date)
+    add.add_argument("end_date", type=parse_date)
+
+    archive = commands.add_parser("archive", help="move a closed term into the archive tables")
+    archive.add_argument("term_id", type=int)
+    archive.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    archive.add_argument("--force", action="store_true", help="archive even if the term has not ended")
+
+    args = parser.parse_args()
+
+    conn = create_connection(args.campus)
+    try:
+        if args.command == "list":
+            for term_id, name, start, end, archived_at in fetchall(conn, "terms.list"):
+                status = f"archived {archived_at:%Y-%m-%d %H:%M}" if archived_at else "hot"
+                print(f"{term_id:>4}  {name:<20} {start} to {end}  {status}")
+        elif args.command == "add":
+            execute(conn, "terms.insert", (args.term_id, args.term_name, args.start_date, args.end_date))
+            conn.commit()
+            print(f"Added term {args.term_name}")
+        else:
+            try:
+                name, moved = archive_term(conn, args.term_id, args.force, args.batch_size)
+            except ValueError as e:
+                parser.exit(1, f"{e}\n")
+            print(f"Archived {name}: " + ", ".join(f"{n} {t} rows" for t, n in moved.items()))
+    finally:
+        close_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
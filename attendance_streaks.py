@@ -0,0 +1,77 @@
+"""Vectorized run-length encoding of attendance streaks.
+
+Input rows must be ordered by student and date. Runs of equal status are
+found with one comparison of each row against the previous one, so a whole
+school year for every student is processed without per-student queries or
+Python loops.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Day status codes returned by the streak query (worst record of the day wins)
+PRESENT, LATE, ABSENT = 0, 1, 2
+
+
+def run_lengths(groups, statuses):
+    """Split ordered rows into runs of equal (group, status).
+
+    `groups` identifies the student of each row (any integer codes whose
+    rows are contiguous). Returns one row per run with its group, status,
+    length and whether it is the group's latest run.
+    """
+    groups = np.asarray(groups)
+    statuses = np.asarray(statuses)
+    n = len(groups)
+    if n == 0:
+        return pd.DataFrame({"group": groups, "status": statuses,
+                             "length": np.array([], dtype=np.int64), "is_last": np.array([], dtype=bool)})
+
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    boundary[1:] = (groups[1:] != groups[:-1]) | (statuses[1:] != statuses[:-1])
+    starts = np.flatnonzero(boundary)
+    lengths = np.diff(np.append(starts, n))
+
+    run_groups = groups[starts]
+    is_last = np.append(run_groups[1:] != run_groups[:-1], True)
+    return pd.DataFrame({"group": run_groups, "status": statuses[starts], "length": lengths, "is_last": is_last})
+
+
+def streak_summary(days, keys=("student_id",), late_counts_as_present=False):
+    """Per-student streak statistics from (keys..., date, day_status) rows.
+
+    Returns longest and current Present streaks, the number and longest of
+    the Absent runs, and the share of Present days, indexed by `keys`.
+    """
+    keys = list(keys)
+    status = days["day_status"].to_numpy()
+    if late_counts_as_present:
+        status = np.where(status == LATE, PRESENT, status)
+    group = days.groupby(keys, sort=False).ngroup().to_numpy()
+
+    runs = run_lengths(group, status)
+    present_runs = runs[runs["status"] == PRESENT]
+    absent_runs = runs[runs["status"] == ABSENT]
+
+    index = days[keys].drop_duplicates().set_index(keys).index
+    summary = pd.DataFrame(index=pd.RangeIndex(len(index)))
+    summary["longest_present"] = present_runs.groupby("group")["length"].max()
+    summary["current_present"] = present_runs[present_runs["is_last"]].set_index("group")["length"]
+    summary["absence_runs"] = absent_runs.groupby("group").size()
+    summary["longest_absence"] = absent_runs.groupby("group")["length"].max()
+    summary = summary.fillna(0).astype(int)
+
+    counts = np.bincount(group, minlength=len(index))
+    present_days = np.bincount(group, weights=(status == PRESENT), minlength=len(index))
+    summary["days"] = counts
+    summary["consistency"] = present_days / np.maximum(counts, 1) * 100
+    summary.index = index
+    return summary
+
+
+def current_run(groups, statuses, status):
+    """Length of each group's latest run if it has `status`, else 0."""
+    runs = run_lengths(groups, statuses)
+    last = runs[runs["is_last"]]
+    return pd.Series(np.where(last["status"] == status, last["length"], 0), index=last["group"])
@@ -0,0 +1,279 @@
+"""Bulk import for Grades and Attendance (and, from cli.py, the other tables).
+
+Rows are validated as whole columns against cached reference sets (known
+student and class IDs, grade-scale bands) and the schema's CHECK domains
+before anything is sent to the database. Valid rows are inserted in
+transactional chunks; rows that fail validation, or belong to a chunk the
+database rejects, are returned with a reason so they can be fixed and
+re-imported.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from queries import executemany, frame
+
+
+BATCH_SIZE = 5000
+
+ATTENDANCE_STATUSES = ["Present", "Absent", "Late"]
+
+ImportResult = namedtuple("ImportResult", ["inserted", "rejected"])
+
+
+def load_reference(conn):
+    """Fetch the ID sets and grade bands imports are validated against."""
+    student_ids = frame(conn, "students.ids")["student_id"].to_numpy()
+    class_ids = frame(conn, "classes.ids")["class_id"].to_numpy()
+    teacher_ids = frame(conn, "teachers.ids")["teacher_id"].to_numpy()
+    bands = frame(conn, "grade_scales.bands")
+    return {"student_ids": np.sort(student_ids), "class_ids": np.sort(class_ids),
+            "teacher_ids": np.sort(teacher_ids), "bands": bands}
+
+
+def load_referenced(conn, table):
+    """IDs of `table` that other rows still point to, so deleting them would break a foreign key."""
+    result = frame(conn, f"{table}.referenced")
+    return np.sort(result.iloc[:, 0].to_numpy())
+
+
+def normalize_columns(df):
+    df = df.copy()
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    return df
+
+
+def _reject(reasons, mask, message):
+    mask = np.asarray(mask, dtype=bool)
+    reasons[mask] = np.where(reasons[mask] == "", message, reasons[mask] + "; " + message)
+
+
+def _check_ids(df, reference, reasons, columns=(("student_id", "student_ids"), ("class_id", "class_ids"))):
+    ids = {}
+    for column, known in columns:
+        if column not in df:
+            _reject(reasons, np.ones(len(df), dtype=bool), f"missing {column} column")
+            ids[column] = pd.Series(np.nan, index=df.index)
+            continue
+        values = pd.to_numeric(df[column], errors="coerce")
+        _reject(reasons, values.isna(), f"invalid {column}")
+        _reject(reasons, values.notna() & ~values.isin(reference[known]), f"unknown {column}")
+        ids[column] = values
+    return ids
+
+
+def _check_int(df, column, reasons):
+    if column not in df:
+        _reject(reasons, np.ones(len(df), dtype=bool), f"missing {column} column")
+        return pd.Series(np.nan, index=df.index)
+    values = pd.to_numeric(df[column], errors="coerce")
+    _reject(reasons, values.isna() | (values % 1 != 0), f"invalid {column}")
+    return values
+
+
+def _check_text(df, column, reasons, max_length):
+    if column not in df:
+        _reject(reasons, np.ones(len(df), dtype=bool), f"missing {column} column")
+        return pd.Series("", index=df.index)
+    values = df[column].astype("string").str.strip()
+    _reject(reasons, (values.isna() | (values == "")).to_numpy(), f"missing {column}")
+    _reject(reasons, (values.str.len() > max_length).fillna(False).to_numpy(),
+            f"{column} longer than {max_length} characters")
+    return values.astype(object)
+
+
+def _check_date(df, column, reasons):
+    if column not in df:
+        _reject(reasons, np.ones(len(df), dtype=bool), f"missing {column} column")
+        return pd.Series(pd.NaT, index=df.index)
+    dates = pd.to_datetime(df[column], errors="coerce")
+    _reject(reasons, dates.isna(), f"invalid {column}")
+    return dates
+
+
+def validate_grades(df, reference):
+    """Split a grades CSV into insertable rows and rejected rows.
+
+    Accepts either a `grade` column with letters from the row's scale
+    (`scale_id`, default 1) or a numeric `points` column.
+    """
+    df = normalize_columns(df)
+    reasons = np.full(len(df), "", dtype=object)
+    ids = _check_ids(df, reference, reasons)
+    dates = _check_date(df, "date_assigned", reasons)
+
+    scale_id = pd.to_numeric(df["scale_id"], errors="coerce") if "scale_id" in df else pd.Series(1, index=df.index)
+    _reject(reasons, scale_id.isna(), "invalid scale_id")
+
+    # Points win where a row has both, so JSON lines may mix the two forms
+    if "points" not in df and "grade" not in df:
+        points = pd.Series(np.nan, index=df.index)
+        _reject(reasons, np.ones(len(df), dtype=bool), "missing grade or points column")
+    else:
+        given = df["points"].notna() if "points" in df else pd.Series(False, index=df.index)
+        points = pd.to_numeric(df["points"], errors="coerce") if "points" in df else pd.Series(np.nan, index=df.index)
+        _reject(reasons, given & (points.isna() | (points < 0) | (points > 100) | (points % 1 != 0)),
+                "points must be a whole number from 0 to 100")
+        by_letter = pd.Series(False, index=df.index)
+        if "grade" in df:
+            lookup = reference["bands"].set_index(["scale_id", "letter"])["points"]
+            keys = pd.MultiIndex.from_arrays([scale_id, df["grade"].astype(str).str.strip().str.upper()])
+            by_letter = ~given & df["grade"].notna()
+            points = points.where(~by_letter, lookup.reindex(keys).to_numpy())
+            _reject(reasons, by_letter & points.isna(), "grade not in scale")
+        _reject(reasons, ~given & ~by_letter, "missing grade or points")
+
+    valid = reasons == ""
+    rows = pd.DataFrame({
+        "student_id": ids["student_id"][valid].astype(int),
+        "class_id": ids["class_id"][valid].astype(int),
+        "scale_id": scale_id[valid].astype(int),
+        "points": points[valid].astype(int),
+        "date_assigned": dates[valid].dt.date,
+    })
+    return rows, df[~valid].assign(reason=reasons[~valid])
+
+
+def validate_attendance(df, reference):
+    """Split an attendance CSV into insertable rows and rejected rows."""
+    df = normalize_columns(df)
+    reasons = np.full(len(df), "", dtype=object)
+    ids = _check_ids(df, reference, reasons)
+    dates = _check_date(df, "date", reasons)
+
+    if "status" in df:
+        status = df["status"].astype(str).str.strip().str.capitalize()
+        _reject(reasons, ~status.isin(ATTENDANCE_STATUSES), "status must be Present, Absent or Late")
+    else:
+        status = pd.Series("", index=df.index)
+        _reject(reasons, np.ones(len(df), dtype=bool), "missing status column")
+
+    # One record per student, class and day, as in the QR check-in flow
+    key = pd.DataFrame({"s": ids["student_id"], "c": ids["class_id"], "d": dates})
+    _reject(reasons, key.duplicated(keep="first") & key.notna().all(axis=1), "duplicate of an earlier row")
+
+    valid = reasons == ""
+    rows = pd.DataFrame({
+        "student_id": ids["student_id"][valid].astype(int),
+        "class_id": ids["class_id"][valid].astype(int),
+        "status": status[valid],
+        "date": dates[valid].dt.date,
+    })
+    return rows, df[~valid].assign(reason=reasons[~valid])
+
+
+def validate_students(df, reference=None):
+    """Split a students file into upsertable rows and rejected rows."""
+    df = normalize_columns(df)
+    reasons = np.full(len(df), "", dtype=object)
+    student_id = _check_int(df, "student_id", reasons)
+    first_name = _check_text(df, "first_name", reasons, 50)
+    last_name = _check_text(df, "last_name", reasons, 50)
+    dob = _check_date(df, "dob", reasons)
+    gender = _check_text(df, "gender", reasons, 10)
+    enrollment_date = _check_date(df, "enrollment_date", reasons)
+
+    valid = reasons == ""
+    rows = pd.DataFrame({
+        "student_id": student_id[valid].astype(int),
+        "first_name": first_name[valid],
+        "last_name": last_name[valid],
+        "dob": dob[valid].dt.date,
+        "gender": gender[valid],
+        "enrollment_date": enrollment_date[valid].dt.date,
+    })
+    return rows, df[~valid].assign(reason=reasons[~valid])
+
+
+def validate_teachers(df, reference=None):
+    """Split a teachers file into upsertable rows and rejected rows."""
+    df = normalize_columns(df)
+    reasons = np.full(len(df), "", dtype=object)
+    teacher_id = _check_int(df, "teacher_id", reasons)
+    first_name = _check_text(df, "first_name", reasons, 50)
+    last_name = _check_text(df, "last_name", reasons, 50)
+    subject = _check_text(df, "subject", reasons, 100)
+
+    valid = reasons == ""
+    rows = pd.DataFrame({
+        "teacher_id": teacher_id[valid].astype(int),
+        "first_name": first_name[valid],
+        "last_name": last_name[valid],
+        "subject": subject[valid],
+    })
+    return rows, df[~valid].assign(reason=reasons[~valid])
+
+
+def validate_classes(df, reference):
+    """Split a classes file into upsertable rows and rejected rows."""
+    df = normalize_columns(df)
+    reasons = np.full(len(df), "", dtype=object)
+    class_id = _check_int(df, "class_id", reasons)
+    class_name = _check_text(df, "class_name", reasons, 100)
+    teacher_id = _check_ids(df, reference, reasons, (("teacher_id", "teacher_ids"),))["teacher_id"]
+
+    valid = reasons == ""
+    rows = pd.DataFrame({
+        "class_id": class_id[valid].astype(int),
+        "class_name": class_name[valid],
+        "teacher_id": teacher_id[valid].astype(int),
+    })
+    return rows, df[~valid].assign(reason=reasons[~valid])
+
+
+def validate_keys(df, column, referenced=None):
+    """Split a file of IDs to delete into key rows and rejected rows.
+
+    IDs in `referenced` (see load_referenced) are rejected instead of
+    failing the whole batch on the foreign key.
+    """
+    df = normalize_columns(df)
+    reasons = np.full(len(df), "", dtype=object)
+    _reject(reasons, df.duplicated(subset=[column]) if column in df else np.zeros(len(df), dtype=bool),
+            "duplicate of an earlier row")
+    keys = _check_int(df, column, reasons)
+    if referenced is not None:
+        _reject(reasons, keys.notna() & keys.isin(referenced), "still referenced by other records")
+    valid = reasons == ""
+    return pd.DataFrame({column: keys[valid].astype(int)}), df[~valid].assign(reason=reasons[~valid])
+
+
+def insert_batches(conn, query, rows, source, batch_size=BATCH_SIZE):
+    """Insert `rows` with the catalog `query`, committing every `batch_size` rows.
+
+    A chunk that fails is rolled back and its original rows (from `source`,
+    aligned on index) are returned as rejected with the database error.
+    """
+    inserted = 0
+    failed = []
+    for start in range(0, len(rows), batch_size):
+        chunk = rows.iloc[start:start + batch_size]
+        params = list(zip(*(chunk[c].tolist() for c in chunk.columns)))
+        try:
+            executemany(conn, query, params)
+            conn.commit()
+            inserted += len(chunk)
+        except Exception as e:
+            conn.rollback()
+            failed.append(source.loc[chunk.index].assign(reason=f"batch rejected by database: {e}"))
+    return inserted, failed
+
+
+def import_grades(conn, df, reference, batch_size=BATCH_SIZE):
+    rows, rejected = validate_grades(df, reference)
+    inserted, failed = insert_batches(conn, "grades.insert", rows, normalize_columns(df), batch_size)
+    return ImportResult(inserted, pd.concat([rejected, *failed]))
+
+
+def import_attendance(conn, df, reference, batch_size=BATCH_SIZE):
+    rows, rejected = validate_attendance(df, reference)
+    # Merged on student, class and date, so re-uploading a file or one that overlaps
+    # QR check-ins updates the existing records instead of duplicating them
+    inserted, failed = insert_batches(conn, "attendance.upsert", rows, normalize_columns(df), batch_size)
+    return ImportResult(inserted, pd.concat([rejected, *failed]))
+
+
+def rejected_report_name(table):
+    return f"{table.lower()}_rejected_{datetime.now():%Y%m%d_%H%M%S}.csv"
@@ -0,0 +1,123 @@
+"""Campus network allow-lists for QR check-in origin validation.
+
+Each campus lists the CIDR blocks its scans may come from (IPv4 and IPv6).
+The blocks are merged into sorted, non-overlapping integer ranges, so
+checking an address is one binary search. The config file is re-read when
+its modification time changes, without restarting the check-in app.
+
+    {"main": ["10.0.0.0/8", "2001:db8:100::/48"], "north": ["192.168.20.0/24"]}
+
+Without the file, or for a campus it does not list, every address is
+allowed, as before the allow-list existed. A file that exists but cannot be
+loaded keeps the last good lists in force; if none was ever loaded from it,
+every check fails (NetworkConfigError) until the file is fixed.
+"""
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+
+
+NETWORK_CONFIG = os.environ.get(
+    "SMS_NETWORK_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "campus_networks.json")
+)
+
+# How often the config file's modification time is checked
+RELOAD_CHECK_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class NetworkConfigError(Exception):
+    pass
+
+
+def parse_address(address):
+    """An ip_address object, with IPv4-mapped IPv6 (::ffff:a.b.c.d) turned into IPv4."""
+    ip = ipaddress.ip_address(address.strip() if isinstance(address, str) else address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        return ip.ipv4_mapped
+    return ip
+
+
+# Stored in Attendance.ip_address: 4 bytes for IPv4, 16 for IPv6
+def pack_address(address):
+    return parse_address(address).packed
+
+
+class AllowList:
+    def __init__(self, cidrs):
+        ranges = {4: [], 6: []}
+        for cidr in cidrs:
+            network = ipaddress.ip_network(cidr, strict=False)
+            ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+        # version -> (sorted range starts, matching range ends)
+        self._tables = {version: _merge(spans) for version, spans in ranges.items()}
+
+    def __contains__(self, address):
+        try:
+            ip = parse_address(address)
+        except ValueError:
+            return False
+        starts, ends = self._tables[ip.version]
+        value = int(ip)
+        i = bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+    def __len__(self):
+        return sum(len(starts) for starts, _ in self._tables.values())
+
+
+def _merge(spans):
+    starts, ends = [], []
+    for start, end in sorted(spans):
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+_lock = threading.Lock()
+# lists is None while the file exists but no valid version of it has been loaded
+_state = {"checked_at": 0.0, "mtime": None, "lists": {}}
+
+
+def _allow_lists():
+    now = time.monotonic()
+    with _lock:
+        if now - _state["checked_at"] < RELOAD_CHECK_SECONDS:
+            return _state["lists"]
+        _state["checked_at"] = now
+        try:
+            mtime = os.stat(NETWORK_CONFIG).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != _state["mtime"]:
+            try:
+                if mtime is None:
+                    lists = {}
+                else:
+                    with open(NETWORK_CONFIG) as f:
+                        lists = {campus: AllowList(cidrs) for campus, cidrs in json.load(f).items()}
+                _state["lists"] = lists
+                _state["mtime"] = mtime
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                # Keep serving the last good lists while the file is being edited, but
+                # never fall back to allowing everything once the file exists
+                logger.error("Could not load %s: %s", NETWORK_CONFIG, e)
+                if _state["mtime"] is None:
+                    _state["lists"] = None
+        return _state["lists"]
+
+
+def address_allowed(campus, address):
+    lists = _allow_lists()
+    if lists is None:
+        raise NetworkConfigError(f"{NETWORK_CONFIG} could not be loaded")
+    allow_list = lists.get(campus)
+    return allow_list is None or address in allow_list
@@ -0,0 +1,174 @@
+"""Headless bulk operations on the school database, for scripted syncs and corrections.
+
+Reads CSV or JSON lines from files or stdin in chunks, validates each chunk
+with the same rules as the dashboard's bulk upload, and writes it through
+the query catalog in transactional batches (one commit per batch). Rows
+that fail validation, or belong to a batch the database rejects, are
+written to a rejected-rows CSV; progress and throughput go to stderr.
+
+    python cli.py upsert students students.csv
+    python cli.py upsert grades grades.jsonl --campus north
+    sis-export | python cli.py upsert attendance - --format jsonl
+    python cli.py delete grades stale_grade_ids.csv
+
+Upserts insert new keys and overwrite existing ones: students, teachers and
+classes by their ID, attendance by student, class and date, grades by
+grade_id when the file has one (rows without it are inserted). Deletes take
+a file with the table's ID column; IDs other rows still refer to are
+rejected. The exit status is 1 when any row was rejected.
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from bulk_import import (
+    BATCH_SIZE, insert_batches, load_reference, load_referenced, normalize_columns, rejected_report_name,
+    validate_attendance, validate_classes, validate_grades, validate_keys, validate_students, validate_teachers
+)
+from db import create_connection, close_connection
+
+
+# table -> (validator, upsert query, key column for deletes)
+TABLES = {
+    "students": (validate_students, "students.upsert", "student_id"),
+    "teachers": (validate_teachers, "teachers.upsert", "teacher_id"),
+    "classes": (validate_classes, "classes.upsert", "class_id"),
+    "grades": (validate_grades, "grades.upsert", "grade_id"),
+    "attendance": (validate_attendance, "attendance.upsert", "attendance_id"),
+}
+
+# Tables whose rows are checked against the student/class/teacher ID sets and grade scales
+REFERENCED = {"classes", "grades", "attendance"}
+
+# Tables other rows point to: IDs still referenced are rejected on delete
+DELETE_CHECKED = {"students", "teachers", "classes"}
+
+
+def read_chunks(path, fmt=None, chunk_size=BATCH_SIZE):
+    """Yield DataFrames of up to `chunk_size` rows from a CSV or JSON-lines file ("-" for stdin)."""
+    if fmt is None:
+        fmt = "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    source = sys.stdin if path == "-" else path
+    if fmt == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        # Everything is read as text; validation converts and reports bad values per row
+        reader = pd.read_csv(source, chunksize=chunk_size, dtype=str)
+    with reader:
+        yield from reader
+
+
+def _grade_statements(rows, source):
+    # Rows with a grade_id are merged on it, rows without one are inserted
+    if "grade_id" not in source:
+        return [("grades.insert", rows)], None
+    raw = source.loc[rows.index, "grade_id"]
+    blank = (raw.isna() | raw.astype(str).str.strip().eq("")).to_numpy()
+    grade_id = pd.to_numeric(raw, errors="coerce")
+    bad = ~blank & (grade_id.isna() | (grade_id % 1 != 0)).to_numpy()
+    keyed = ~blank & ~bad
+    upserts = rows[keyed].copy()
+    upserts.insert(0, "grade_id", grade_id[keyed].astype(int))
+    rejected = source.loc[rows.index[bad]].assign(reason="invalid grade_id")
+    return [("grades.upsert", upserts), ("grades.insert", rows[blank])], rejected
+
+
+def prepare(operation, table, chunk, reference):
+    """Validate a chunk; returns ([(catalog query, rows), ...], rejected rows).
+
+    `reference` is load_reference() for upserts and load_referenced() for deletes.
+    """
+    validate, upsert, key = TABLES[table]
+    if operation == "delete":
+        rows, rejected = validate_keys(chunk, key, reference)
+        return [(f"{table}.delete", rows)], rejected
+    rows, rejected = validate(chunk, reference)
+    if table == "grades":
+        statements, invalid_ids = _grade_statements(rows, normalize_columns(chunk))
+        return statements, pd.concat([rejected, invalid_ids])
+    return [(upsert, rows)], rejected
+
+
+class Progress:
+    def __init__(self, label, out=sys.stderr):
+        self.label = label
+        self.out = out
+        self.read = self.written = self.rejected = 0
+        self.start = time.perf_counter()
+
+    @property
+    def rate(self):
+        return self.read / max(time.perf_counter() - self.start, 1e-9)
+
+    def show(self):
+        print(f"\r{self.label}: {self.read:,} rows read, {self.written:,} written, "
+              f"{self.rejected:,} rejected ({self.rate:,.0f} rows/s)", end="", file=self.out, flush=True)
+
+
+def run(operation, table, path, fmt=None, campus=None, batch_size=BATCH_SIZE, rejected_path=None):
+    progress = Progress(f"{operation} {table}")
+    rejected_path = rejected_path or rejected_report_name(table)
+    rejected_file = None
+    conn = create_connection(campus)
+    try:
+        reference = None
+        if operation == "upsert" and table in REFERENCED:
+            reference = load_reference(conn)
+        elif operation == "delete" and table in DELETE_CHECKED:
+            reference = load_referenced(conn, table)
+        for chunk in read_chunks(path, fmt, batch_size):
+            statements, rejected = prepare(operation, table, chunk, reference)
+            source = normalize_columns(chunk)
+            failed = []
+            for query, rows in statements:
+                written, batch_failed = insert_batches(conn, query, rows, source, batch_size)
+                progress.written += written
+                failed += batch_failed
+            rejected = pd.concat([rejected, *failed])
+
+            progress.read += len(chunk)
+            progress.rejected += len(rejected)
+            if not rejected.empty:
+                if rejected_file is None:
+                    rejected_file = open(rejected_path, "w", newline="", encoding="utf-8")
+                    rejected.to_csv(rejected_file, index=False)
+                else:
+                    rejected.to_csv(rejected_file, index=False, header=False)
+            progress.show()
+    finally:
+        close_connection(conn)
+        if rejected_file is not None:
+            rejected_file.close()
+    print(file=progress.out)
+    return progress, rejected_path if rejected_file is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk upsert or delete rows without the Streamlit UI.")
+    parser.add_argument("--campus", default=None, help="campus to run against (default: the configured default campus)")
+    commands = parser.add_subparsers(dest="operation", required=True)
+    for operation, help_text in (("upsert", "insert or update rows from a file"),
+                                 ("delete", "delete the rows whose IDs are listed in a file")):
+        command = commands.add_parser(operation, help=help_text)
+        command.add_argument("table", choices=list(TABLES))
+        command.add_argument("file", help='CSV or JSON-lines file, "-" for stdin')
+        command.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                             help="input format (default: from the file extension, CSV for stdin)")
+        command.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+        command.add_argument("--rejected", default=None, help="where to write rejected rows (default: a timestamped CSV)")
+    args = parser.parse_args()
+
+    progress, rejected_path = run(args.operation, args.table, args.file, args.format, args.campus,
+                                  args.batch_size, args.rejected)
+    elapsed = time.perf_counter() - progress.start
+    print(f"{args.operation} {args.table}: {progress.written:,} of {progress.read:,} rows written "
+          f"in {elapsed:.1f}s ({progress.rate:,.0f} rows/s)")
+    if rejected_path:
+        print(f"{progress.rejected:,} rows rejected, see {rejected_path}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
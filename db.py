@@ -0,0 +1,364 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pyodbc
+
+
+DEFAULT_CONNECTION_STRING = (
+    'DRIVER={ODBC Driver 17 for SQL Server};'
+    'SERVER=localhost;'
+    'DATABASE=School_Grading_and_Attendance_System_DB;'
+    'Trusted_Connection=yes;'
+)
+
+# Campus -> database routing, e.g. {"default": "main", "campuses": {"main": "<ODBC connection string>", ...}}.
+# A campus can also be {"primary": "...", "replica": "..."} to send dashboard reads to a replica;
+# "sqlite:///path.db" targets stand in for real servers when testing locally
+CAMPUS_CONFIG = os.environ.get(
+    "SMS_CAMPUS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "campuses.json")
+)
+
+# Reads fall back to the primary when the replica is further behind than this
+MAX_REPLICA_LAG_MS = int(os.environ.get("SMS_MAX_REPLICA_LAG_MS", "5000"))
+
+# How long a replica lag measurement is reused before it is taken again
+LAG_CHECK_SECONDS = 2.0
+
+# How often the heartbeat writer advances ReplicaHeartbeat on the primary
+HEARTBEAT_SECONDS = 1.0
+
+_campuses = None
+
+
+# Without a config file there is a single campus on the local database
+def load_campuses():
+    global _campuses
+    if _campuses is None:
+        if os.path.exists(CAMPUS_CONFIG):
+            with open(CAMPUS_CONFIG) as f:
+                config = json.load(f)
+            campuses = config["campuses"]
+            default = config.get("default", next(iter(campuses)))
+        else:
+            campuses = {"main": DEFAULT_CONNECTION_STRING}
+            default = "main"
+        campuses = {
+            name: target if isinstance(target, dict) else {"primary": target}
+            for name, target in campuses.items()
+        }
+        _campuses = (default, campuses)
+    return _campuses
+
+
+def campus_names():
+    return list(load_campuses()[1])
+
+
+def default_campus():
+    return load_campuses()[0]
+
+
+class Connection:
+    """A pyodbc/sqlite3 connection that knows its campus and role.
+
+    Committing on the primary records the time of the write, so this
+    process's reads stay off the replica until it has caught up with it.
+    """
+
+    def __init__(self, raw, campus, role, dialect):
+        self.raw = raw
+        self.campus = campus
+        self.role = role
+        self.dialect = dialect
+        self._statements = {}
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def cursor(self):
+        return self.raw.cursor()
+
+    # One cursor per statement text (see queries.py): pyodbc skips SQLPrepare
+    # when a cursor executes the same text it ran last
+    def prepared(self, sql):
+        cursor = self._statements.get(sql)
+        if cursor is None:
+            cursor = self._statements[sql] = self.raw.cursor()
+        return cursor
+
+    def commit(self):
+        self.raw.commit()
+        if self.role == "write" and has_replica(self.campus):
+            _note_write(self.campus)
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        for cursor in self._statements.values():
+            cursor.close()
+        self._statements.clear()
+        self.raw.close()
+
+
+def _connect(target):
+    if target.startswith("sqlite:///"):
+        return sqlite3.connect(target[len("sqlite:///"):], check_same_thread=False), "sqlite"
+    return pyodbc.connect(target), "mssql"
+
+
+def has_replica(campus):
+    return "replica" in load_campuses()[1][campus]
+
+
+# Database connection for a campus (the default campus when none is given).
+# Writes and anything that must see the latest data use role="write" (the
+# primary); dashboard reads pass role="read" and go to the replica when one
+# is configured, caught up with this process's writes and not lagging
+def create_connection(campus=None, role="write"):
+    default, campuses = load_campuses()
+    campus = campus or default
+    if campus not in campuses:
+        raise ValueError(f"Unknown campus: {campus}")
+    targets = campuses[campus]
+    if role == "read" and "replica" in targets and _replica_usable(campus):
+        raw, dialect = _connect(targets["replica"])
+        return Connection(raw, campus, "read", dialect)
+    raw, dialect = _connect(targets["primary"])
+    return Connection(raw, campus, "write", dialect)
+
+
+# Replica lag is measured with ReplicaHeartbeat: a background writer in each
+# process that reads from a replica moves the primary's beat (epoch
+# milliseconds) forward every HEARTBEAT_SECONDS, and the replica's copy
+# trails it by however far replication is behind. Commits never touch the
+# heartbeat row, so writes (QR check-ins above all) do not queue on its lock.
+# Read-your-writes: once a beat written after our commit has reached the
+# replica, the commit has reached it too
+_lock = threading.Lock()
+_last_write = {}   # campus -> monotonic time of this process's latest commit
+_beats = {}        # campus -> deque of (monotonic time the write started, beat) of recent heartbeats
+_writers = {}      # campus -> heartbeat writer thread
+_lag_checks = {}   # campus -> (checked_at, primary beat, replica beat)
+
+
+# The heartbeat statements live in the query catalog, which imports this
+# module, hence the imports inside the functions. Heartbeat connections use
+# their own role, so their commits are not recorded as this process's writes
+
+def _write_heartbeat(conn):
+    from queries import execute, fetchone
+    now = int(time.time() * 1000)
+    execute(conn, "heartbeat.write", (now, now))
+    beat = fetchone(conn, "heartbeat.read")[0]
+    conn.commit()
+    return beat
+
+
+def _heartbeat_loop(campus, target):
+    conn = None
+    while True:
+        started = time.monotonic()
+        try:
+            if conn is None:
+                raw, dialect = _connect(target)
+                conn = Connection(raw, campus, "heartbeat", dialect)
+            beat = _write_heartbeat(conn)
+            with _lock:
+                _beats[campus].append((started, beat))
+        except Exception:
+            # Reconnect on the next beat; meanwhile the beats go stale and reads stay on the primary
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            conn = None
+        time.sleep(HEARTBEAT_SECONDS)
+
+
+def _start_heartbeat(campus):
+    with _lock:
+        if campus in _writers:
+            return
+        # Enough beats to cover any commit the lag limit can still wait for
+        _beats[campus] = deque(maxlen=int(MAX_REPLICA_LAG_MS / 1000 / HEARTBEAT_SECONDS) + 10)
+        target = load_campuses()[1][campus]["primary"]
+        _writers[campus] = threading.Thread(target=_heartbeat_loop, args=(campus, target),
+                                            name=f"heartbeat-{campus}", daemon=True)
+        _writers[campus].start()
+
+
+def _read_heartbeat(campus, target):
+    from queries import fetchone
+    raw, dialect = _connect(target)
+    conn = Connection(raw, campus, "heartbeat", dialect)
+    try:
+        row = fetchone(conn, "heartbeat.read")
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
+def _note_write(campus):
+    with _lock:
+        _last_write[campus] = time.monotonic()
+        # The cached replica beat predates this write; measure again on the next read
+        _lag_checks.pop(campus, None)
+
+
+def _replica_usable(campus):
+    _start_heartbeat(campus)
+    with _lock:
+        checked = _lag_checks.get(campus)
+        last_write = _last_write.get(campus)
+        beats = list(_beats[campus])
+    # Without recent beats of our own the primary's beat may be stale and the lag unknown
+    if not beats or time.monotonic() - beats[-1][0] > MAX_REPLICA_LAG_MS / 1000:
+        return False
+    # The first beat started after our latest commit; until there is one, stay on the primary
+    required = 0
+    if last_write is not None:
+        required = next((beat for started, beat in beats if started >= last_write), None)
+        if required is None:
+            return False
+    if checked is None or time.monotonic() - checked[0] > LAG_CHECK_SECONDS:
+        targets = load_campuses()[1][campus]
+        try:
+            checked = (time.monotonic(), _read_heartbeat(campus, targets["primary"]),
+                       _read_heartbeat(campus, targets["replica"]))
+        except Exception:
+            # An unreachable replica is treated as lagging
+            checked = (time.monotonic(), 1, 0)
+        with _lock:
+            _lag_checks[campus] = checked
+    _, primary_beat, replica_beat = checked
+    # Read-your-writes: the replica must already contain our latest commit
+    if replica_beat < required:
+        return False
+    return primary_beat - replica_beat <= MAX_REPLICA_LAG_MS
+
+# Connection closure function
+def close_connection(conn):
+    if conn:
+        conn.close()
+
+FETCH_BATCH_SIZE = 10000
+
+# Repetitive text columns that are stored as pandas categoricals by default
+CATEGORY_COLUMNS = {"status", "letter", "grade", "class_name", "gender", "subject"}
+
+NUMERIC_TYPES = (int, float, Decimal, bool)
+
+
+def _column_buffer(name, type_code, categories):
+    if name in categories:
+        return _CategoryBuffer()
+    if type_code in (date, datetime):
+        return _ChunkBuffer("datetime64[D]" if type_code is date else "datetime64[us]")
+    if type_code in NUMERIC_TYPES:
+        return _ChunkBuffer(None)
+    return _ListBuffer()
+
+
+class _CategoryBuffer:
+    # Values are turned into int32 codes as they arrive; only the distinct
+    # strings are kept as Python objects
+    def __init__(self):
+        self.codes = array("i")
+        self.lookup = {None: -1}
+
+    def extend(self, values):
+        lookup = self.lookup
+        self.codes.extend(lookup.setdefault(v, len(lookup) - 1) for v in values)
+
+    def finish(self):
+        categories = [v for v in self.lookup if v is not None]
+        return pd.Categorical.from_codes(np.frombuffer(self.codes, dtype=np.int32), categories=categories)
+
+
+class _ChunkBuffer:
+    # Each batch becomes one NumPy array (NULLs as NaT / NaN); the chunks are
+    # concatenated once at the end
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.chunks = []
+
+    def extend(self, values):
+        if self.dtype is None:
+            if None in values:
+                self.chunks.append(np.array([np.nan if v is None else float(v) for v in values]))
+            else:
+                self.chunks.append(np.array(values, dtype=float if isinstance(values[0], (float, Decimal)) else None))
+        else:
+            self.chunks.append(np.array(values, dtype=self.dtype))
+
+    def finish(self):
+        if not self.chunks:
+            return np.array([], dtype=self.dtype or float)
+        return np.concatenate(self.chunks)
+
+
+class _ListBuffer:
+    def __init__(self):
+        self.values = []
+
+    def extend(self, values):
+        self.values.extend(values)
+
+    def finish(self):
+        return self.values
+
+
+# Stream a result set in fetchmany batches straight into typed column buffers:
+# low-cardinality text becomes categorical, dates become datetime64 and
+# numbers NumPy arrays, without materializing all Row objects first
+def fetch_frame(cursor, sql, params=(), columns=None, categories=CATEGORY_COLUMNS):
+    cursor.execute(sql, params)
+    names = [column[0] for column in cursor.description]
+    buffers = [_column_buffer(column[0], column[1], categories) for column in cursor.description]
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        for values, buffer in zip(zip(*batch), buffers):
+            buffer.extend(values)
+    return pd.DataFrame({name: buffer.finish() for name, buffer in zip(columns or names, buffers)})
+
+
+# Run the same fetch (a function of the connection returning a DataFrame) on
+# every campus in parallel and stack the results with a "Campus" column;
+# callers merge partial aggregates with merge_partials()
+def scatter_gather(fetch, campuses=None):
+    campuses = campuses or campus_names()
+
+    def run(campus):
+        conn = create_connection(campus, role="read")
+        try:
+            frame = fetch(conn)
+        finally:
+            close_connection(conn)
+        frame.insert(0, "Campus", campus)
+        return frame
+
+    with ThreadPoolExecutor(max_workers=len(campuses)) as pool:
+        frames = list(pool.map(run, campuses))
+    merged = pd.concat(frames, ignore_index=True)
+    for column in frames[0].select_dtypes("category").columns:
+        merged[column] = merged[column].astype("category")
+    return merged
+
+
+# Combine per-shard partial sums/counts that share the same keys
+def merge_partials(frame, keys, sums):
+    return frame.groupby(keys, as_index=False, observed=True)[sums].sum()
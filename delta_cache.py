@@ -0,0 +1,63 @@
+"""Client-side cache of dashboard views kept fresh with SQL Server change tracking.
+
+Each cached view remembers the change-tracking version it was loaded at
+(its high-water mark). On refresh only the rows whose keys changed since
+that version are fetched and merged in, so the cost of a rerun follows the
+rate of change instead of the size of the table. A full reload happens the
+first time, and whenever the stored version has been cleaned up on the
+server (older than CHANGE_TRACKING_MIN_VALID_VERSION). Without change
+tracking (SQLite test databases) every fetch is a full reload.
+"""
+import pandas as pd
+
+from queries import QUERIES, fetchall, fetchone, frame
+
+
+class DeltaView:
+    """A dashboard view whose statements are registered as delta.<name>.* (see queries.define_delta_view)."""
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key    # key column in the resulting DataFrame
+        # The changed-keys query binds the cached version to every "?"
+        self.version_params = QUERIES[f"delta.{name}.changed_keys"].sql.count("?")
+
+    def fetch(self, conn, store, params=()):
+        """Return the view as a DataFrame, refreshing the copy held in `store`."""
+        cache_key = f"delta:{self.name}:{params}"
+        # Read the version first: anything committed after it is picked up again next time
+        current_version = fetchone(conn, "delta.current_version")[0]
+        if current_version is None:
+            # No change tracking (SQLite, or not enabled on the database): nothing to refresh from
+            return frame(conn, f"delta.{self.name}.all", params)
+
+        cached = store.get(cache_key)
+        if cached is not None and cached[0] == current_version:
+            return cached[1]
+
+        if cached is None or cached[0] < (fetchone(conn, f"delta.{self.name}.min_valid_version")[0] or 0):
+            result = frame(conn, f"delta.{self.name}.all", params)
+        else:
+            result = self._merge(conn, cached, params)
+
+        store[cache_key] = (current_version, result)
+        return result
+
+    def _merge(self, conn, cached, params):
+        version, cached_frame = cached
+        version_params = (version,) * self.version_params
+
+        changed = [row[0] for row in fetchall(conn, f"delta.{self.name}.changed_keys", version_params)]
+        if not changed:
+            return cached_frame
+
+        # Changed keys are dropped and re-read; deleted rows simply do not come back
+        delta = frame(conn, f"delta.{self.name}.changed_rows", tuple(params) + version_params)
+        kept = cached_frame[~cached_frame[self.key].isin(changed)]
+        merged = pd.concat([kept, delta], ignore_index=True) if not delta.empty else kept.reset_index(drop=True)
+
+        # Concatenating categoricals with different categories falls back to object
+        for column in cached_frame.select_dtypes("category").columns:
+            if merged[column].dtype != "category":
+                merged[column] = merged[column].astype("category")
+        return merged.sort_values(self.key, ignore_index=True)
@@ -0,0 +1,66 @@
+-- Migrate Grades from letter strings to numeric points backed by a grade-scale table.
+-- Run once against an existing database with sqlcmd or SSMS (GO separates the batches).
+USE School_Grading_and_Attendance_System_DB;
+GO
+
+CREATE TABLE GradeScales (
+    scale_id INT PRIMARY KEY,
+    scale_name NVARCHAR(50) NOT NULL
+);
+
+CREATE TABLE GradeScaleBands (
+    scale_id INT FOREIGN KEY REFERENCES GradeScales(scale_id),
+    letter NVARCHAR(2) NOT NULL,
+    points TINYINT NOT NULL,
+    min_points TINYINT NOT NULL,
+    max_points TINYINT NOT NULL,
+    PRIMARY KEY (scale_id, letter)
+);
+
+INSERT INTO GradeScales (scale_id, scale_name) VALUES (1, 'Standard (+/-)');
+
+INSERT INTO GradeScaleBands (scale_id, letter, points, min_points, max_points) VALUES
+    (1, 'A+', 98, 97, 100),
+    (1, 'A',  95, 93, 96),
+    (1, 'A-', 91, 90, 92),
+    (1, 'B+', 88, 87, 89),
+    (1, 'B',  85, 83, 86),
+    (1, 'B-', 81, 80, 82),
+    (1, 'C+', 78, 77, 79),
+    (1, 'C',  75, 73, 76),
+    (1, 'C-', 71, 70, 72),
+    (1, 'D+', 68, 67, 69),
+    (1, 'D',  65, 63, 66),
+    (1, 'D-', 61, 60, 62),
+    (1, 'F',  55, 0, 59);
+GO
+
+ALTER TABLE Grades ADD
+    scale_id INT NOT NULL CONSTRAINT DF_Grades_scale_id DEFAULT 1
+        CONSTRAINT FK_Grades_scale_id FOREIGN KEY REFERENCES GradeScales(scale_id),
+    points TINYINT NULL;
+GO
+
+-- Existing A-F letters get the same points the old CASE expressions used
+UPDATE G
+SET G.points = B.points
+FROM Grades G
+JOIN GradeScaleBands B ON B.scale_id = 1 AND B.letter = G.grade;
+GO
+
+-- The CHECK on the old letter column was created without a name, so look it up
+DECLARE @drop NVARCHAR(MAX) = N'';
+SELECT @drop = @drop + N'ALTER TABLE Grades DROP CONSTRAINT ' + QUOTENAME(cc.name) + N';'
+FROM sys.check_constraints cc
+JOIN sys.columns c ON c.object_id = cc.parent_object_id AND c.column_id = cc.parent_column_id
+WHERE cc.parent_object_id = OBJECT_ID('Grades') AND c.name = 'grade';
+EXEC sp_executesql @drop;
+
+ALTER TABLE Grades DROP COLUMN grade;
+ALTER TABLE Grades ADD CONSTRAINT CK_Grades_points CHECK (points BETWEEN 0 AND 100);
+GO
+
+CREATE INDEX IX_Grades_student_points ON Grades (student_id) INCLUDE (points);
+CREATE INDEX IX_Grades_class_points ON Grades (class_id) INCLUDE (points);
+CREATE INDEX IX_Grades_points ON Grades (points) INCLUDE (student_id);
+GO
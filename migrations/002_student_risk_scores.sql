@@ -0,0 +1,15 @@
+-- Table filled by the risk_scoring.py batch job.
+USE School_Grading_and_Attendance_System_DB;
+GO
+
+CREATE TABLE StudentRiskScores (
+    student_id INT PRIMARY KEY FOREIGN KEY REFERENCES Students(student_id),
+    attendance_rate FLOAT NULL,
+    absence_streak INT NOT NULL,
+    grade_slope FLOAT NOT NULL,
+    risk_score FLOAT NOT NULL,
+    computed_at DATETIME2 NOT NULL
+);
+
+CREATE INDEX IX_StudentRiskScores_risk ON StudentRiskScores (risk_score DESC);
+GO
@@ -0,0 +1,14 @@
+-- Enable change tracking for the dashboard's delta-refreshed views (see delta_cache.py).
+-- Classes is tracked too so renamed classes reach the cached Grades and Attendance views.
+USE School_Grading_and_Attendance_System_DB;
+GO
+
+ALTER DATABASE School_Grading_and_Attendance_System_DB
+    SET CHANGE_TRACKING = ON (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON);
+GO
+
+ALTER TABLE Students ENABLE CHANGE_TRACKING;
+ALTER TABLE Classes ENABLE CHANGE_TRACKING;
+ALTER TABLE Grades ENABLE CHANGE_TRACKING;
+ALTER TABLE Attendance ENABLE CHANGE_TRACKING;
+GO
@@ -0,0 +1,53 @@
+-- Terms, archive tables and history views used by archive_terms.py.
+USE School_Grading_and_Attendance_System_DB;
+GO
+
+-- Terms are closed by archive_terms.py, which moves their Attendance and Grades rows
+-- into the archive tables so the hot tables only hold the current term
+CREATE TABLE Terms (
+    term_id INT PRIMARY KEY,
+    term_name NVARCHAR(50) NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    archived_at DATETIME2 NULL
+);
+
+-- Same columns as the hot tables, without IDENTITY, foreign keys or CHECKs:
+-- rows are moved with DELETE ... OUTPUT INTO, whose target cannot have them
+CREATE TABLE Attendance_Archive (
+    attendance_id INT PRIMARY KEY,
+    student_id INT,
+    class_id INT,
+    date DATE,
+    status NVARCHAR(10),
+    ip_address NVARCHAR(15) NULL
+);
+
+CREATE TABLE Grades_Archive (
+    grade_id INT PRIMARY KEY,
+    student_id INT,
+    class_id INT,
+    scale_id INT NOT NULL,
+    points TINYINT,
+    date_assigned DATE
+);
+
+CREATE INDEX IX_Attendance_date ON Attendance (date);
+CREATE INDEX IX_Attendance_student_class_date ON Attendance (student_id, class_id, date);
+CREATE INDEX IX_Grades_date_assigned ON Grades (date_assigned);
+CREATE INDEX IX_Attendance_Archive_student_date ON Attendance_Archive (student_id, date);
+CREATE INDEX IX_Grades_Archive_student ON Grades_Archive (student_id) INCLUDE (points);
+GO
+
+-- Hot and archived rows together, for the dashboard's "include history" option
+CREATE VIEW Attendance_History AS
+    SELECT attendance_id, student_id, class_id, date, status, ip_address FROM Attendance
+    UNION ALL
+    SELECT attendance_id, student_id, class_id, date, status, ip_address FROM Attendance_Archive;
+GO
+
+CREATE VIEW Grades_History AS
+    SELECT grade_id, student_id, class_id, scale_id, points, date_assigned FROM Grades
+    UNION ALL
+    SELECT grade_id, student_id, class_id, scale_id, points, date_assigned FROM Grades_Archive;
+GO
@@ -0,0 +1,11 @@
+-- Heartbeat row used by db.py to measure read-replica lag and for read-your-writes.
+USE School_Grading_and_Attendance_System_DB;
+GO
+
+CREATE TABLE ReplicaHeartbeat (
+    id INT PRIMARY KEY,
+    beat BIGINT NOT NULL
+);
+
+INSERT INTO ReplicaHeartbeat (id, beat) VALUES (1, 0);
+GO
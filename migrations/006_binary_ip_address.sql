@@ -0,0 +1,37 @@
+-- Store Attendance.ip_address as packed binary (4 bytes IPv4, 16 bytes IPv6) instead of NVARCHAR(15).
+-- Run once against an existing database with sqlcmd or SSMS (GO separates the batches).
+USE School_Grading_and_Attendance_System_DB;
+GO
+
+ALTER TABLE Attendance ADD ip_address_bin VARBINARY(16) NULL;
+ALTER TABLE Attendance_Archive ADD ip_address_bin VARBINARY(16) NULL;
+GO
+
+-- Existing values are dotted IPv4 strings; PARSENAME splits them into octets.
+-- Anything that is not a valid IPv4 address becomes NULL
+UPDATE Attendance
+SET ip_address_bin =
+    CAST(TRY_CAST(PARSENAME(ip_address, 4) AS TINYINT) AS BINARY(1)) +
+    CAST(TRY_CAST(PARSENAME(ip_address, 3) AS TINYINT) AS BINARY(1)) +
+    CAST(TRY_CAST(PARSENAME(ip_address, 2) AS TINYINT) AS BINARY(1)) +
+    CAST(TRY_CAST(PARSENAME(ip_address, 1) AS TINYINT) AS BINARY(1))
+WHERE ip_address IS NOT NULL;
+
+UPDATE Attendance_Archive
+SET ip_address_bin =
+    CAST(TRY_CAST(PARSENAME(ip_address, 4) AS TINYINT) AS BINARY(1)) +
+    CAST(TRY_CAST(PARSENAME(ip_address, 3) AS TINYINT) AS BINARY(1)) +
+    CAST(TRY_CAST(PARSENAME(ip_address, 2) AS TINYINT) AS BINARY(1)) +
+    CAST(TRY_CAST(PARSENAME(ip_address, 1) AS TINYINT) AS BINARY(1))
+WHERE ip_address IS NOT NULL;
+GO
+
+ALTER TABLE Attendance DROP COLUMN ip_address;
+ALTER TABLE Attendance_Archive DROP COLUMN ip_address;
+EXEC sp_rename 'Attendance.ip_address_bin', 'ip_address', 'COLUMN';
+EXEC sp_rename 'Attendance_Archive.ip_address_bin', 'ip_address', 'COLUMN';
+GO
+
+-- The history view selects ip_address by name; refresh its metadata for the new type
+EXEC sp_refreshview 'Attendance_History';
+GO
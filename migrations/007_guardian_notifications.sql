@@ -0,0 +1,27 @@
+-- Guardians and the notification log used by absence_notifications.py.
+USE School_Grading_and_Attendance_System_DB;
+GO
+
+CREATE TABLE Guardians (
+    guardian_id INT PRIMARY KEY IDENTITY(1,1),
+    student_id INT NOT NULL FOREIGN KEY REFERENCES Students(student_id),
+    guardian_name NVARCHAR(100) NOT NULL,
+    email NVARCHAR(254) NULL
+);
+
+CREATE INDEX IX_Guardians_student ON Guardians (student_id) INCLUDE (guardian_name, email);
+
+-- One row per student, day and channel: claimed before sending, so a student
+-- is notified at most once a day even when the job runs after every period
+CREATE TABLE NotificationLog (
+    student_id INT NOT NULL,
+    notify_date DATE NOT NULL,
+    channel NVARCHAR(20) NOT NULL,
+    status NVARCHAR(10) NOT NULL CHECK (status IN ('sending', 'sent')),
+    recipients INT NOT NULL,
+    updated_at DATETIME2 NOT NULL,   -- Claimed at while 'sending', delivered at once 'sent'
+    PRIMARY KEY (notify_date, channel, student_id)
+);
+
+CREATE INDEX IX_Attendance_date_status ON Attendance (date, status) INCLUDE (student_id, class_id);
+GO
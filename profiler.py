@@ -0,0 +1,218 @@
+"""Opt-in sampling profiler for Streamlit reruns.
+
+A background thread samples the script thread's Python stack every few
+milliseconds while a rerun executes, so the page code runs unmodified and
+the overhead stays low. Named sections (tabs, forms) are recorded as extra
+frames at the root of each sample. At the end of the rerun the samples are
+written to `profiles/` as a speedscope JSON file (open at speedscope.app)
+and as collapsed stacks (flamegraph.pl, inferno), and can be summarised as
+a table of the hottest frames.
+
+Turn it on with SMS_PROFILE=1 or the "Profile this page" sidebar toggle.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+
+PROFILE_ENABLED = os.environ.get("SMS_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.environ.get("SMS_PROFILE_DIR", "profiles")
+INTERVAL_MS = float(os.environ.get("SMS_PROFILE_INTERVAL_MS", "5"))
+
+# Where a sample's time goes, by the outermost library frame on its stack
+# (st.dataframe converting a DataFrame counts as streamlit, not pandas).
+# Driver calls are C code with no Python frame, so database time is found
+# by the modules that call the driver
+CATEGORIES = [
+    ("database", ("db.py", "queries.py", "delta_cache.py")),
+    ("streamlit", ("streamlit",)),
+    ("matplotlib", ("matplotlib",)),
+    ("pandas/numpy", ("pandas", "numpy", "pyarrow")),
+]
+
+# Profiler running on each script thread, so sections opened anywhere in the page find it
+_active = {}
+
+
+class Profiler:
+    def __init__(self, name, interval_ms=INTERVAL_MS):
+        self.name = name
+        self.interval = interval_ms / 1000
+        self.thread_id = threading.get_ident()
+        self.frames = []        # (function, file, line)
+        self._frame_index = {}
+        self.samples = []       # (tuple of frame indices root to leaf, weight ms, category)
+        self._sections = ()
+        self._stop = threading.Event()
+        self._thread = None
+        self._root_file = None
+        self.started_at = None
+        self.elapsed_ms = 0.0
+        self.paths = None
+
+    def start(self):
+        # Stacks are cut at the first frame of the running script, dropping Streamlit's runner frames
+        script = getattr(sys.modules.get("__main__"), "__file__", None)
+        self._root_file = os.path.abspath(script) if script else None
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed_ms = (time.perf_counter() - self._start) * 1000
+
+    @contextmanager
+    def section(self, name):
+        # Replaced, not mutated, so the sampler always reads a consistent tuple
+        previous = self._sections
+        self._sections = previous + (name,)
+        try:
+            yield
+        finally:
+            self._sections = previous
+
+    def _intern(self, key):
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append(key)
+        return index
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self._record(frame, self._sections, (now - last) * 1000)
+            last = now
+
+    def _record(self, frame, sections, weight):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        for i, (_, filename, _) in enumerate(stack):
+            if os.path.abspath(filename) == self._root_file:
+                stack = stack[i:]
+                break
+
+        category = next((c for c in (_category(f) for _, f, _ in stack) if c), "python")
+
+        keys = [(f"[{name}]", "", 0) for name in sections] + stack
+        self.samples.append((tuple(self._intern(k) for k in keys), weight, category))
+
+    def frame_label(self, index):
+        function, filename, line = self.frames[index]
+        if not filename:
+            return function
+        return f"{function} ({os.path.basename(filename)}:{line})"
+
+    def summary(self, top=20):
+        """Hottest frames by self time, with their total (inclusive) time."""
+        self_ms, total_ms = Counter(), Counter()
+        for stack, weight, _ in self.samples:
+            self_ms[stack[-1]] += weight
+            for index in set(stack):
+                total_ms[index] += weight
+        sampled = sum(weight for _, weight, _ in self.samples) or 1
+        rows = [(self.frame_label(i), ms, total_ms[i], ms / sampled * 100) for i, ms in self_ms.most_common(top)]
+        return pd.DataFrame(rows, columns=["Frame", "Self (ms)", "Total (ms)", "Self (%)"])
+
+    def categories(self):
+        """Sampled time per category (database, streamlit, matplotlib, pandas/numpy, python)."""
+        totals = Counter()
+        for _, weight, category in self.samples:
+            totals[category] += weight
+        sampled = sum(totals.values()) or 1
+        rows = [(category, ms, ms / sampled * 100) for category, ms in totals.most_common()]
+        return pd.DataFrame(rows, columns=["Category", "Time (ms)", "Share (%)"])
+
+    def save(self, directory=PROFILE_DIR):
+        """Write speedscope JSON and collapsed stacks; returns the two paths."""
+        os.makedirs(directory, exist_ok=True)
+        slug = "".join(c if c.isalnum() else "_" for c in self.name.lower())
+        base = os.path.join(directory, f"{self.started_at:%Y%m%d_%H%M%S_%f}_{slug}")
+
+        speedscope = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.name} {self.started_at:%Y-%m-%d %H:%M:%S}",
+            "exporter": "school-management-system profiler",
+            "shared": {"frames": [
+                {"name": function, "file": filename, "line": line} if filename else {"name": function}
+                for function, filename, line in self.frames
+            ]},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weight for _, weight, _ in self.samples),
+                "samples": [list(stack) for stack, _, _ in self.samples],
+                "weights": [weight for _, weight, _ in self.samples],
+            }],
+        }
+        with open(f"{base}.speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(speedscope, f)
+
+        collapsed = Counter()
+        for stack, weight, _ in self.samples:
+            collapsed[";".join(self.frame_label(i).replace(";", ":") for i in stack)] += weight
+        with open(f"{base}.folded", "w", encoding="utf-8") as f:
+            for stack, ms in collapsed.items():
+                # flamegraph.pl expects integer counts; microseconds keep the resolution
+                f.write(f"{stack} {round(ms * 1000)}\n")
+
+        return f"{base}.speedscope.json", f"{base}.folded"
+
+
+def _category(filename):
+    parts = filename.replace("\\", "/").split("/")
+    for category, markers in CATEGORIES:
+        if any(marker in parts for marker in markers):
+            return category
+    return None
+
+
+@contextmanager
+def profile_rerun(name, enabled=True, directory=PROFILE_DIR):
+    """Sample the current thread for the duration of the block.
+
+    Yields the stopped-and-saved Profiler afterwards (None when disabled),
+    so callers can show its summary once the block has finished.
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = Profiler(name)
+    _active[profiler.thread_id] = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        del _active[profiler.thread_id]
+        profiler.paths = profiler.save(directory)
+
+
+@contextmanager
+def profile_section(name):
+    """Attribute samples taken inside the block to `name`; a no-op when not profiling."""
+    profiler = _active.get(threading.get_ident())
+    if profiler is None:
+        yield
+        return
+    with profiler.section(name):
+        yield
@@ -0,0 +1,823 @@
+"""Named, parameterized SQL statements used by the dashboard, the check-in app and the batch jobs.
+
+Each statement is registered once with its declared result columns and is
+normalized (comments dropped, whitespace collapsed) so every call sends
+byte-identical text and SQL Server reuses one cached plan per query. The
+wrapped connection keeps one cursor per statement text, which pyodbc
+re-executes without preparing again. Statements that differ between T-SQL
+and SQLite (used for local testing) carry a per-dialect variant, and every
+execution is reported to the registered listeners.
+
+    from queries import fetchall, frame
+    students = fetchall(conn, "students.options")
+    df = frame(conn, "reports.class_performance", grades="Grades_History")
+"""
+import re
+import time
+from collections import namedtuple
+
+from db import CATEGORY_COLUMNS, FETCH_BATCH_SIZE, fetch_frame, scatter_gather
+
+
+QueryEvent = namedtuple("QueryEvent", ["name", "campus", "dialect", "elapsed_ms", "rows", "error"])
+
+QUERIES = {}
+
+# Called with a QueryEvent after every catalog execution, e.g. for timing or logging
+listeners = []
+
+
+class Query:
+    def __init__(self, name, sql, columns=None, categories=CATEGORY_COLUMNS, **dialects):
+        self.name = name
+        self.sql = sql
+        self.columns = columns
+        self.categories = categories
+        self.dialects = dialects   # dialect name -> SQL replacing the T-SQL text
+        self._rendered = {}
+
+    # Table placeholders ({grades}, {attendance}) pick the hot table or its *_History view
+    def text(self, dialect, **tables):
+        key = (dialect, tuple(sorted(tables.items())))
+        sql = self._rendered.get(key)
+        if sql is None:
+            sql = self._rendered[key] = normalize(self.dialects.get(dialect, self.sql).format(**tables))
+        return sql
+
+
+def normalize(sql):
+    sql = re.sub(r"--[^\n]*", "", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def define(name, sql, columns=None, categories=CATEGORY_COLUMNS, **dialects):
+    if name in QUERIES:
+        raise ValueError(f"Query {name} is already defined")
+    QUERIES[name] = Query(name, sql, columns, categories, **dialects)
+    return QUERIES[name]
+
+
+def add_listener(listener):
+    listeners.append(listener)
+
+
+def _run(conn, name, tables, consume):
+    query = QUERIES[name]
+    sql = query.text(conn.dialect, **tables)
+    cursor = conn.prepared(sql)
+    start = time.perf_counter()
+    rows, error = None, None
+    try:
+        result, rows = consume(query, cursor, sql)
+        return result
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if listeners:
+            event = QueryEvent(name, conn.campus, conn.dialect, (time.perf_counter() - start) * 1000, rows, error)
+            for listener in listeners:
+                listener(event)
+
+
+# Results are always read to the end, so a cached cursor never holds a pending
+# result set that would block the next statement on the same connection
+
+def execute(conn, name, params=(), **tables):
+    """Run an INSERT/UPDATE/DELETE; returns the affected row count."""
+    def consume(query, cursor, sql):
+        cursor.execute(sql, params)
+        return cursor.rowcount, cursor.rowcount
+    return _run(conn, name, tables, consume)
+
+
+def executemany(conn, name, rows, **tables):
+    """Run a statement once per parameter row, batched into one round trip on SQL Server."""
+    def consume(query, cursor, sql):
+        if conn.dialect == "mssql":
+            cursor.fast_executemany = True
+        cursor.executemany(sql, rows)
+        return len(rows), len(rows)
+    return _run(conn, name, tables, consume)
+
+
+def fetchall(conn, name, params=(), **tables):
+    def consume(query, cursor, sql):
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        return rows, len(rows)
+    return _run(conn, name, tables, consume)
+
+
+def fetchone(conn, name, params=(), **tables):
+    rows = fetchall(conn, name, params, **tables)
+    return rows[0] if rows else None
+
+
+def stream(conn, name, params=(), size=FETCH_BATCH_SIZE, **tables):
+    """Yield the result in lists of up to `size` rows, for results too large to hold at once."""
+    # A cursor of its own: the caller may stop early and leave rows unread
+    query = QUERIES[name]
+    sql = query.text(conn.dialect, **tables)
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    rows, error = 0, None
+    try:
+        cursor.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(size)
+            if not batch:
+                break
+            rows += len(batch)
+            yield batch
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        cursor.close()
+        if listeners:
+            event = QueryEvent(name, conn.campus, conn.dialect, (time.perf_counter() - start) * 1000, rows, error)
+            for listener in listeners:
+                listener(event)
+
+
+def frame(conn, name, params=(), **tables):
+    """Fetch into a typed DataFrame labelled with the query's declared columns."""
+    def consume(query, cursor, sql):
+        df = fetch_frame(cursor, sql, params, columns=query.columns, categories=query.categories)
+        return df, len(df)
+    return _run(conn, name, tables, consume)
+
+
+def gather(name, params=(), campuses=None, **tables):
+    """frame() on every campus in parallel, stacked with a "Campus" column."""
+    return scatter_gather(lambda conn: frame(conn, name, params, **tables), campuses)
+
+
+# Students
+
+define("students.insert", """
+    INSERT INTO Students (student_id, first_name, last_name, dob, gender, enrollment_date)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+
+define("students.ids", "SELECT student_id FROM Students")
+
+define("students.options", "SELECT student_id, first_name, last_name FROM Students",
+       columns=["student_id", "First Name", "Last Name"])
+
+define("students.get", "SELECT * FROM Students WHERE student_id = ?")
+
+define("students.update", """
+    UPDATE Students
+    SET first_name = ?, last_name = ?, dob = ?, gender = ?
+    WHERE student_id = ?
+""")
+
+define("students.delete", "DELETE FROM Students WHERE student_id = ?")
+
+# Students that a foreign key keeps from being deleted
+define("students.referenced", """
+    SELECT student_id FROM Attendance
+    UNION SELECT student_id FROM Grades
+    UNION SELECT student_id FROM StudentRiskScores
+    UNION SELECT student_id FROM Guardians
+""")
+
+# Bulk upserts (cli.py): insert new keys, overwrite existing ones
+define("students.upsert", """
+    MERGE Students WITH (HOLDLOCK) AS T
+    USING (VALUES (?, ?, ?, ?, ?, ?)) AS S (student_id, first_name, last_name, dob, gender, enrollment_date)
+    ON T.student_id = S.student_id
+    WHEN MATCHED THEN UPDATE SET
+        first_name = S.first_name, last_name = S.last_name, dob = S.dob,
+        gender = S.gender, enrollment_date = S.enrollment_date
+    WHEN NOT MATCHED THEN
+        INSERT (student_id, first_name, last_name, dob, gender, enrollment_date)
+        VALUES (S.student_id, S.first_name, S.last_name, S.dob, S.gender, S.enrollment_date);
+""")
+
+define("students.exists", "SELECT 1 FROM Students WHERE student_id = ?")
+
+# Teachers
+
+define("teachers.insert", """
+    INSERT INTO Teachers (teacher_id, first_name, last_name, subject)
+    VALUES (?, ?, ?, ?)
+""")
+
+define("teachers.ids", "SELECT teacher_id FROM Teachers")
+
+define("teachers.all", "SELECT * FROM Teachers")
+
+define("teachers.options", "SELECT teacher_id, first_name, last_name FROM Teachers")
+
+define("teachers.get", "SELECT * FROM Teachers WHERE teacher_id = ?")
+
+define("teachers.update", """
+    UPDATE Teachers
+    SET first_name = ?, last_name = ?, subject = ?
+    WHERE teacher_id = ?
+""")
+
+define("teachers.delete", "DELETE FROM Teachers WHERE teacher_id = ?")
+
+define("teachers.referenced", "SELECT DISTINCT teacher_id FROM Classes WHERE teacher_id IS NOT NULL")
+
+define("teachers.upsert", """
+    MERGE Teachers WITH (HOLDLOCK) AS T
+    USING (VALUES (?, ?, ?, ?)) AS S (teacher_id, first_name, last_name, subject)
+    ON T.teacher_id = S.teacher_id
+    WHEN MATCHED THEN UPDATE SET
+        first_name = S.first_name, last_name = S.last_name, subject = S.subject
+    WHEN NOT MATCHED THEN
+        INSERT (teacher_id, first_name, last_name, subject)
+        VALUES (S.teacher_id, S.first_name, S.last_name, S.subject);
+""")
+
+# Classes
+
+define("classes.insert", """
+    INSERT INTO Classes (class_id, class_name, teacher_id)
+    VALUES (?, ?, ?)
+""")
+
+define("classes.ids", "SELECT class_id FROM Classes")
+
+define("classes.options", "SELECT class_id, class_name FROM Classes")
+
+define("classes.with_teachers", """
+    SELECT C.class_id, C.class_name, T.first_name, T.last_name
+    FROM Classes C
+    JOIN Teachers T ON C.teacher_id = T.teacher_id
+""", columns=["Class ID", "Class Name", "Teacher First Name", "Teacher Last Name"])
+
+define("classes.get", "SELECT class_name, teacher_id FROM Classes WHERE class_id = ?")
+
+define("classes.update", """
+    UPDATE Classes
+    SET class_name = ?, teacher_id = ?
+    WHERE class_id = ?
+""")
+
+define("classes.delete", "DELETE FROM Classes WHERE class_id = ?")
+
+define("classes.referenced", """
+    SELECT class_id FROM Attendance
+    UNION SELECT class_id FROM Grades
+""")
+
+define("classes.upsert", """
+    MERGE Classes WITH (HOLDLOCK) AS T
+    USING (VALUES (?, ?, ?)) AS S (class_id, class_name, teacher_id)
+    ON T.class_id = S.class_id
+    WHEN MATCHED THEN UPDATE SET
+        class_name = S.class_name, teacher_id = S.teacher_id
+    WHEN NOT MATCHED THEN
+        INSERT (class_id, class_name, teacher_id)
+        VALUES (S.class_id, S.class_name, S.teacher_id);
+""")
+
+# Grade scales
+
+define("grade_scales.options", "SELECT scale_id, scale_name FROM GradeScales")
+
+define("grade_scales.bands", "SELECT scale_id, letter, points FROM GradeScaleBands ORDER BY scale_id, points DESC",
+       categories=())
+
+define("grade_scales.bands_for_scale", """
+    SELECT letter, points, min_points, max_points
+    FROM GradeScaleBands
+    WHERE scale_id = ?
+    ORDER BY points DESC
+""")
+
+# Grades
+
+GRADES_SELECT = """
+    SELECT G.grade_id, S.first_name, S.last_name, C.class_name, B.letter, G.points, G.date_assigned
+    FROM {grades} G
+    JOIN Students S ON G.student_id = S.student_id
+    JOIN Classes C ON G.class_id = C.class_id
+    LEFT JOIN GradeScaleBands B ON B.scale_id = G.scale_id
+        AND G.points BETWEEN B.min_points AND B.max_points
+"""
+
+GRADES_COLUMNS = ["Grade ID", "Student First Name", "Student Last Name", "Class Name", "Grade", "Points", "Date Assigned"]
+
+define("grades.insert", """
+    INSERT INTO Grades (student_id, class_id, scale_id, points, date_assigned)
+    VALUES (?, ?, ?, ?, ?)
+""")
+
+define("grades.view", GRADES_SELECT + " ORDER BY G.grade_id", columns=GRADES_COLUMNS)
+
+define("grades.options", """
+    SELECT G.grade_id, G.student_id, G.class_id, B.letter
+    FROM Grades G
+    LEFT JOIN GradeScaleBands B ON B.scale_id = G.scale_id
+        AND G.points BETWEEN B.min_points AND B.max_points
+""")
+
+define("grades.get", """
+    SELECT student_id, class_id, scale_id, points, date_assigned
+    FROM Grades
+    WHERE grade_id = ?
+""")
+
+define("grades.update", """
+    UPDATE Grades
+    SET points = ?, date_assigned = ?
+    WHERE grade_id = ?
+""")
+
+define("grades.delete", "DELETE FROM Grades WHERE grade_id = ?")
+
+# grade_id is an IDENTITY: a known id is updated, an unknown one is inserted under a new id
+define("grades.upsert", """
+    MERGE Grades WITH (HOLDLOCK) AS T
+    USING (VALUES (?, ?, ?, ?, ?, ?)) AS S (grade_id, student_id, class_id, scale_id, points, date_assigned)
+    ON T.grade_id = S.grade_id
+    WHEN MATCHED THEN UPDATE SET
+        student_id = S.student_id, class_id = S.class_id, scale_id = S.scale_id,
+        points = S.points, date_assigned = S.date_assigned
+    WHEN NOT MATCHED THEN
+        INSERT (student_id, class_id, scale_id, points, date_assigned)
+        VALUES (S.student_id, S.class_id, S.scale_id, S.points, S.date_assigned);
+""")
+
+# Attendance
+
+ATTENDANCE_SELECT = """
+    SELECT A.attendance_id, S.first_name, S.last_name, C.class_name, A.status, A.date
+    FROM {attendance} A
+    JOIN Students S ON A.student_id = S.student_id
+    JOIN Classes C ON A.class_id = C.class_id
+"""
+
+ATTENDANCE_COLUMNS = ["Attendance ID", "Student First Name", "Student Last Name", "Class Name", "Status", "Date"]
+
+define("attendance.insert", """
+    INSERT INTO Attendance (student_id, class_id, status, date)
+    VALUES (?, ?, ?, ?)
+""")
+
+define("attendance.view_for_class", ATTENDANCE_SELECT + " WHERE C.class_id = ? ORDER BY A.attendance_id",
+       columns=ATTENDANCE_COLUMNS)
+
+define("attendance.options", "SELECT attendance_id, student_id, class_id, status FROM Attendance")
+
+define("attendance.get", """
+    SELECT student_id, class_id, status, date
+    FROM Attendance
+    WHERE attendance_id = ?
+""")
+
+define("attendance.update", """
+    UPDATE Attendance
+    SET status = ?, date = ?
+    WHERE attendance_id = ?
+""")
+
+define("attendance.delete", "DELETE FROM Attendance WHERE attendance_id = ?")
+
+# Keyed on one record per student, class and day, as in the QR check-in flow
+define("attendance.upsert", """
+    MERGE Attendance WITH (HOLDLOCK) AS T
+    USING (VALUES (?, ?, ?, ?)) AS S (student_id, class_id, status, date)
+    ON T.student_id = S.student_id AND T.class_id = S.class_id AND T.date = S.date
+    WHEN MATCHED THEN UPDATE SET status = S.status
+    WHEN NOT MATCHED THEN
+        INSERT (student_id, class_id, status, date)
+        VALUES (S.student_id, S.class_id, S.status, S.date);
+""")
+
+# QR check-in (Attendance/app2.py): one record per student, class and day
+
+define("attendance.exists_today", """
+    SELECT 1 FROM Attendance
+    WHERE student_id = ? AND class_id = ? AND date = CAST(GETDATE() AS DATE)
+""", sqlite="SELECT 1 FROM Attendance WHERE student_id = ? AND class_id = ? AND date = date('now')")
+
+define("attendance.check_in", """
+    INSERT INTO Attendance (student_id, class_id, status, ip_address)
+    VALUES (?, ?, 'Present', ?)
+""")
+
+# Dashboard views refreshed from change tracking (delta_cache.py)
+
+# SQLite has no change tracking: NULL makes every DeltaView fetch a full reload
+define("delta.current_version", "SELECT CHANGE_TRACKING_CURRENT_VERSION()", sqlite="SELECT NULL")
+
+
+def define_delta_view(name, select, key_expr, tables, changed_keys, columns=None, where=None):
+    """Register the statements a DeltaView runs as delta.<name>.*.
+
+    `changed_keys` lists the keys changed since the version bound to every
+    "?"; `where` is an optional filter with its own "?" parameters, which
+    come before the versions.
+    """
+    def query(*filters):
+        filters = [f for f in filters if f]
+        return f"{select} {'WHERE ' + ' AND '.join(filters) if filters else ''} ORDER BY {key_expr}"
+
+    define(f"delta.{name}.all", query(where), columns=columns)
+    define(f"delta.{name}.changed_keys", changed_keys)
+    define(f"delta.{name}.changed_rows", query(where, f"{key_expr} IN ({changed_keys})"), columns=columns)
+    # A cached copy older than this version can no longer be brought up to date from the changes
+    define(f"delta.{name}.min_valid_version", "SELECT MAX(v) FROM (VALUES {}) AS t(v)".format(
+        ", ".join(f"(CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('{table}')))" for table in tables)
+    ))
+
+
+define_delta_view(
+    "students", "SELECT * FROM Students", "student_id", ["Students"],
+    "SELECT student_id FROM CHANGETABLE(CHANGES Students, ?) AS CT",
+)
+
+# A renamed student or class changes the rows that join to it as well
+define_delta_view(
+    "grades", GRADES_SELECT.format(grades="Grades"), "G.grade_id", ["Grades", "Students", "Classes"], """
+        SELECT grade_id FROM CHANGETABLE(CHANGES Grades, ?) AS CT
+        UNION
+        SELECT G2.grade_id FROM Grades G2 JOIN CHANGETABLE(CHANGES Students, ?) AS CT ON G2.student_id = CT.student_id
+        UNION
+        SELECT G2.grade_id FROM Grades G2 JOIN CHANGETABLE(CHANGES Classes, ?) AS CT ON G2.class_id = CT.class_id
+    """,
+    columns=GRADES_COLUMNS,
+)
+
+define_delta_view(
+    "attendance", ATTENDANCE_SELECT.format(attendance="Attendance"), "A.attendance_id",
+    ["Attendance", "Students", "Classes"], """
+        SELECT attendance_id FROM CHANGETABLE(CHANGES Attendance, ?) AS CT
+        UNION
+        SELECT A2.attendance_id FROM Attendance A2 JOIN CHANGETABLE(CHANGES Students, ?) AS CT ON A2.student_id = CT.student_id
+        UNION
+        SELECT A2.attendance_id FROM Attendance A2 JOIN CHANGETABLE(CHANGES Classes, ?) AS CT ON A2.class_id = CT.class_id
+    """,
+    columns=ATTENDANCE_COLUMNS,
+    where="C.class_id = ?",
+)
+
+# Advanced queries; across campuses they return sums and counts so partial results merge exactly
+
+define("reports.top_students", """
+    SELECT TOP 10
+        S.first_name,
+        S.last_name,
+        AVG(CAST(G.points AS FLOAT)) AS average_grade
+    FROM {grades} G
+    JOIN Students S ON G.student_id = S.student_id
+    GROUP BY S.first_name, S.last_name
+    ORDER BY average_grade DESC
+""", columns=["First Name", "Last Name", "Average Grade"], sqlite="""
+    SELECT S.first_name, S.last_name, AVG(CAST(G.points AS FLOAT)) AS average_grade
+    FROM {grades} G
+    JOIN Students S ON G.student_id = S.student_id
+    GROUP BY S.first_name, S.last_name
+    ORDER BY average_grade DESC
+    LIMIT 10
+""")
+
+define("reports.class_performance", """
+    SELECT
+        C.class_name,
+        SUM(CAST(G.points AS FLOAT)) AS points_sum,
+        COUNT(G.points) AS grade_count
+    FROM {grades} G
+    JOIN Classes C ON G.class_id = C.class_id
+    GROUP BY C.class_name
+""", columns=["Class Name", "Points Sum", "Grade Count"])
+
+define("reports.attendance_summary", """
+    SELECT
+        S.first_name,
+        S.last_name,
+        COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS present_count,
+        COUNT(A.attendance_id) AS total_classes,
+        CASE
+            WHEN COUNT(A.attendance_id) > 0 THEN
+                (CAST(COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS FLOAT) / COUNT(A.attendance_id)) * 100
+            ELSE 0
+        END AS attendance_rate
+    FROM Students S
+    LEFT JOIN {attendance} A ON S.student_id = A.student_id
+    GROUP BY S.first_name, S.last_name
+    ORDER BY attendance_rate DESC
+""", columns=["First Name", "Last Name", "Present Count", "Total Classes", "Attendance Rate (%)"])
+
+define("reports.underperforming", """
+    SELECT
+        S.first_name,
+        S.last_name,
+        AVG(CAST(G.points AS FLOAT)) AS average_grade
+    FROM {grades} G
+    JOIN Students S ON G.student_id = S.student_id
+    -- An average below 70 needs at least one grade below 70, so seek the
+    -- points index for candidates instead of averaging every student
+    WHERE G.student_id IN (SELECT student_id FROM {grades} WHERE points < 70)
+    GROUP BY S.first_name, S.last_name
+    HAVING AVG(CAST(G.points AS FLOAT)) < 70
+    ORDER BY average_grade ASC
+""", columns=["First Name", "Last Name", "Average Grade"])
+
+define("reports.attendance_trends", """
+    SELECT
+        DATEPART(month, A.date) AS month,
+        COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS present_count,
+        COUNT(A.attendance_id) AS total_classes
+    FROM {attendance} A
+    GROUP BY DATEPART(month, A.date)
+""", columns=["Month", "Present Count", "Total Classes"], sqlite="""
+    SELECT
+        CAST(strftime('%m', A.date) AS INTEGER) AS month,
+        COUNT(CASE WHEN A.status = 'Present' THEN 1 END) AS present_count,
+        COUNT(A.attendance_id) AS total_classes
+    FROM {attendance} A
+    GROUP BY CAST(strftime('%m', A.date) AS INTEGER)
+""")
+
+# The worst record of each day wins (Absent > Late > Present), see attendance_streaks.py
+define("reports.day_statuses", """
+    SELECT
+        student_id,
+        date,
+        MAX(CASE status WHEN 'Absent' THEN 2 WHEN 'Late' THEN 1 ELSE 0 END) AS day_status
+    FROM {attendance}
+    WHERE date BETWEEN ? AND ?
+    GROUP BY student_id, date
+    ORDER BY student_id, date
+""", columns=["student_id", "date", "day_status"])
+
+define("reports.at_risk", """
+    SELECT
+        S.first_name,
+        S.last_name,
+        R.attendance_rate * 100,
+        R.absence_streak,
+        R.grade_slope,
+        R.risk_score,
+        R.computed_at
+    FROM StudentRiskScores R
+    JOIN Students S ON R.student_id = S.student_id
+    WHERE R.risk_score >= ?
+    ORDER BY R.risk_score DESC
+""", columns=["First Name", "Last Name", "Attendance Rate (%)", "Absence Streak", "Grade Slope (pts/week)",
+              "Risk Score", "Computed At"])
+
+# Replica heartbeat (db.py): the beat only moves forward, even if clocks disagree
+
+define("heartbeat.write", "UPDATE ReplicaHeartbeat SET beat = CASE WHEN beat < ? THEN ? ELSE beat + 1 END WHERE id = 1")
+
+define("heartbeat.read", "SELECT beat FROM ReplicaHeartbeat WHERE id = 1")
+
+# Batch jobs
+
+define("risk.attendance_since", """
+    SELECT student_id, date, status
+    FROM {attendance}
+    WHERE date >= ?
+    ORDER BY student_id, date
+""")
+
+define("risk.grades_since", """
+    SELECT student_id, date_assigned, points
+    FROM {grades}
+    WHERE date_assigned >= ? AND points IS NOT NULL
+    ORDER BY student_id, date_assigned
+""")
+
+define("risk.clear_scores", "DELETE FROM StudentRiskScores")
+
+define("risk.insert_score", """
+    INSERT INTO StudentRiskScores
+        (student_id, attendance_rate, absence_streak, grade_slope, risk_score, computed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+
+# Absence notifications (absence_notifications.py)
+
+# One row per guardian of every student absent or late on the day who has not
+# been notified on this channel yet (or whose claim was abandoned mid-run)
+define("notifications.pending", """
+    WITH day AS (
+        SELECT
+            A.student_id,
+            STRING_AGG(CASE WHEN A.status = 'Absent' THEN C.class_name END, ', ') AS absent_classes,
+            STRING_AGG(CASE WHEN A.status = 'Late' THEN C.class_name END, ', ') AS late_classes
+        FROM Attendance A
+        JOIN Classes C ON A.class_id = C.class_id
+        WHERE A.date = ? AND A.status IN ('Absent', 'Late')
+        GROUP BY A.student_id
+    )
+    SELECT D.student_id, S.first_name, S.last_name, D.absent_classes, D.late_classes, G.guardian_name, G.email
+    FROM day D
+    JOIN Students S ON D.student_id = S.student_id
+    JOIN Guardians G ON G.student_id = D.student_id AND G.email IS NOT NULL
+    WHERE NOT EXISTS (
+        SELECT 1 FROM NotificationLog N
+        WHERE N.notify_date = ? AND N.channel = ? AND N.student_id = D.student_id
+    )
+    ORDER BY D.student_id
+""", categories=())
+
+define("notifications.release_stale", """
+    DELETE FROM NotificationLog
+    WHERE notify_date = ? AND channel = ? AND status = 'sending'
+        AND updated_at < DATEADD(minute, -?, SYSDATETIME())
+""")
+
+define("notifications.claim", """
+    INSERT INTO NotificationLog (student_id, notify_date, channel, status, recipients, updated_at)
+    VALUES (?, ?, ?, 'sending', ?, SYSDATETIME())
+""")
+
+define("notifications.mark_sent", """
+    UPDATE NotificationLog
+    SET status = 'sent', updated_at = SYSDATETIME()
+    WHERE student_id = ? AND notify_date = ? AND channel = ?
+""")
+
+define("notifications.release", """
+    DELETE FROM NotificationLog
+    WHERE student_id = ? AND notify_date = ? AND channel = ? AND status = 'sending'
+""")
+
+define("report_cards.students", """
+    SELECT student_id, first_name, last_name
+    FROM Students
+    ORDER BY student_id
+""")
+
+define("report_cards.grades", """
+    WITH per_class AS (
+        SELECT student_id, class_id, scale_id,
+               AVG(CAST(points AS FLOAT)) AS average_points,
+               COUNT(*) AS grade_count
+        FROM Grades_History
+        WHERE date_assigned BETWEEN ? AND ? AND points IS NOT NULL
+        GROUP BY student_id, class_id, scale_id
+    )
+    SELECT P.student_id, C.class_name, T.first_name + ' ' + T.last_name AS teacher,
+           P.grade_count, P.average_points, B.letter
+    FROM per_class P
+    JOIN Classes C ON P.class_id = C.class_id
+    LEFT JOIN Teachers T ON C.teacher_id = T.teacher_id
+    LEFT JOIN GradeScaleBands B ON B.scale_id = P.scale_id
+        AND ROUND(P.average_points, 0) BETWEEN B.min_points AND B.max_points
+    ORDER BY P.student_id, C.class_name
+""", categories=())
+
+define("report_cards.attendance", """
+    SELECT student_id, YEAR(date) AS year, MONTH(date) AS month,
+           SUM(CASE WHEN status = 'Present' THEN 1 ELSE 0 END) AS present,
+           SUM(CASE WHEN status = 'Late' THEN 1 ELSE 0 END) AS late,
+           SUM(CASE WHEN status = 'Absent' THEN 1 ELSE 0 END) AS absent,
+           COUNT(*) AS total
+    FROM Attendance_History
+    WHERE date BETWEEN ? AND ?
+    GROUP BY student_id, YEAR(date), MONTH(date)
+    ORDER BY student_id, YEAR(date), MONTH(date)
+""")
+
+# Term archive (archive_terms.py)
+
+define("terms.list", "SELECT term_id, term_name, start_date, end_date, archived_at FROM Terms ORDER BY start_date")
+
+define("terms.get", "SELECT term_name, start_date, end_date FROM Terms WHERE term_id = ?")
+
+define("terms.insert", """
+    INSERT INTO Terms (term_id, term_name, start_date, end_date)
+    VALUES (?, ?, ?, ?)
+""")
+
+define("terms.mark_archived", "UPDATE Terms SET archived_at = SYSDATETIME() WHERE term_id = ?",
+       sqlite="UPDATE Terms SET archived_at = datetime('now') WHERE term_id = ?")
+
+# One batch per statement: DELETE ... OUTPUT INTO moves the rows in a single atomic step
+define("terms.archive_attendance", """
+    DELETE TOP (?) FROM Attendance
+    OUTPUT DELETED.attendance_id, DELETED.student_id, DELETED.class_id, DELETED.date,
+           DELETED.status, DELETED.ip_address
+    INTO Attendance_Archive (attendance_id, student_id, class_id, date, status, ip_address)
+    WHERE date BETWEEN ? AND ?
+""")
+
+define("terms.archive_grades", """
+    DELETE TOP (?) FROM Grades
+    OUTPUT DELETED.grade_id, DELETED.student_id, DELETED.class_id, DELETED.scale_id,
+           DELETED.points, DELETED.date_assigned
+    INTO Grades_Archive (grade_id, student_id, class_id, scale_id, points, date_assigned)
+    WHERE date_assigned BETWEEN ? AND ?
+""")
+
+# Snapshots (snapshot.py); parents before children, each read in key order
+
+define("snapshot.isolation", """
+    SELECT snapshot_isolation_state FROM sys.databases WHERE name = DB_NAME()
+""", sqlite="SELECT 0")
+
+define("snapshot.begin", "SET TRANSACTION ISOLATION LEVEL SNAPSHOT")
+
+define("snapshot.grade_scales", "SELECT scale_id, scale_name FROM GradeScales ORDER BY scale_id")
+
+define("snapshot.grade_scale_bands", """
+    SELECT scale_id, letter, points, min_points, max_points
+    FROM GradeScaleBands
+    ORDER BY scale_id, letter
+""")
+
+define("snapshot.teachers", "SELECT teacher_id, first_name, last_name, subject FROM Teachers ORDER BY teacher_id")
+
+define("snapshot.students", """
+    SELECT student_id, first_name, last_name, dob, gender, enrollment_date
+    FROM Students
+    ORDER BY student_id
+""")
+
+define("snapshot.classes", "SELECT class_id, class_name, teacher_id FROM Classes ORDER BY class_id")
+
+define("snapshot.attendance", """
+    SELECT attendance_id, student_id, class_id, date, status, ip_address
+    FROM Attendance
+    ORDER BY attendance_id
+""")
+
+define("snapshot.grades", """
+    SELECT grade_id, student_id, class_id, scale_id, points, date_assigned
+    FROM Grades
+    ORDER BY grade_id
+""")
+
+define("snapshot.terms", "SELECT term_id, term_name, start_date, end_date, archived_at FROM Terms ORDER BY term_id")
+
+define("snapshot.attendance_archive", """
+    SELECT attendance_id, student_id, class_id, date, status, ip_address
+    FROM Attendance_Archive
+    ORDER BY attendance_id
+""")
+
+define("snapshot.grades_archive", """
+    SELECT grade_id, student_id, class_id, scale_id, points, date_assigned
+    FROM Grades_Archive
+    ORDER BY grade_id
+""")
+
+# Restores only go into empty tables; the seeded grade scale is replaced by the snapshot's.
+# The archive tables count too: their IDs share the *_History views with the restored ones
+define("restore.rows", """
+    SELECT (SELECT COUNT(*) FROM Students) + (SELECT COUNT(*) FROM Teachers) + (SELECT COUNT(*) FROM Classes)
+         + (SELECT COUNT(*) FROM Attendance) + (SELECT COUNT(*) FROM Grades) + (SELECT COUNT(*) FROM Terms)
+         + (SELECT COUNT(*) FROM Attendance_Archive) + (SELECT COUNT(*) FROM Grades_Archive)
+""")
+
+define("restore.clear_grade_scale_bands", "DELETE FROM GradeScaleBands")
+
+define("restore.clear_grade_scales", "DELETE FROM GradeScales")
+
+define("restore.grade_scales", "INSERT INTO GradeScales (scale_id, scale_name) VALUES (?, ?)")
+
+define("restore.grade_scale_bands", """
+    INSERT INTO GradeScaleBands (scale_id, letter, points, min_points, max_points)
+    VALUES (?, ?, ?, ?, ?)
+""")
+
+define("restore.teachers", "INSERT INTO Teachers (teacher_id, first_name, last_name, subject) VALUES (?, ?, ?, ?)")
+
+define("restore.students", """
+    INSERT INTO Students (student_id, first_name, last_name, dob, gender, enrollment_date)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+
+define("restore.classes", "INSERT INTO Classes (class_id, class_name, teacher_id) VALUES (?, ?, ?)")
+
+# Explicit IDs need IDENTITY_INSERT on SQL Server, which then continues the identity after the highest one
+define("restore.identity_insert_on", "SET IDENTITY_INSERT {table} ON")
+
+define("restore.identity_insert_off", "SET IDENTITY_INSERT {table} OFF")
+
+define("restore.attendance", """
+    INSERT INTO Attendance (attendance_id, student_id, class_id, date, status, ip_address)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+
+define("restore.grades", """
+    INSERT INTO Grades (grade_id, student_id, class_id, scale_id, points, date_assigned)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+
+define("restore.terms", """
+    INSERT INTO Terms (term_id, term_name, start_date, end_date, archived_at)
+    VALUES (?, ?, ?, ?, ?)
+""")
+
+define("restore.attendance_archive", """
+    INSERT INTO Attendance_Archive (attendance_id, student_id, class_id, date, status, ip_address)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+
+define("restore.grades_archive", """
+    INSERT INTO Grades_Archive (grade_id, student_id, class_id, scale_id, points, date_assigned)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
@@ -0,0 +1,194 @@
+"""Generate end-of-term report cards for every student.
+
+All data comes from three bulk queries (students, per-class grade averages,
+monthly attendance counts), read through the *_History views so terms that
+have already been archived can still be reported on. Rendering is spread
+over a process pool and the finished cards are streamed to a zip file or a
+directory as they complete.
+
+    python report_cards.py --start 2024-09-01 --end 2025-01-31 --out report_cards.zip
+    python report_cards.py --start 2024-09-01 --end 2025-01-31 --out cards/ --format pdf
+
+PDF output needs the optional `weasyprint` package.
+"""
+import argparse
+import importlib.util
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemLoader
+
+from db import create_connection, close_connection
+from queries import frame
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_templates")
+
+# Students rendered per task sent to a worker process
+CHUNK_SIZE = 200
+
+# Chunks queued or rendering per worker; finished cards are written and
+# dropped before more are submitted, so memory follows the work in flight
+CHUNKS_IN_FLIGHT = 2
+
+# Change in monthly attendance rate (percentage points) that counts as a trend
+TREND_THRESHOLD = 2.0
+
+
+def load_report_data(conn, start, end):
+    students = frame(conn, "report_cards.students")
+    grades = frame(conn, "report_cards.grades", (start, end))
+    attendance = frame(conn, "report_cards.attendance", (start, end))
+    return students, grades, attendance
+
+
+def build_payloads(students, grades, attendance, start, end):
+    # Attendance rates and labels are computed for all rows at once; the
+    # per-student split is a single groupby on each frame
+    if not attendance.empty:
+        attendance["rate"] = attendance["present"] / attendance["total"] * 100
+        attendance["month"] = (attendance["year"].astype(str) + "-"
+                               + attendance["month"].astype(str).str.zfill(2))
+    grades[["teacher", "letter"]] = grades[["teacher", "letter"]].fillna("")
+    grades_by_student = {sid: g.to_dict("records") for sid, g in grades.groupby("student_id")}
+    attendance_by_student = {sid: a.to_dict("records") for sid, a in attendance.groupby("student_id")}
+
+    context = {"term_start": start, "term_end": end, "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M")}
+    for student in students.to_dict("records"):
+        sid = student["student_id"]
+        yield {
+            **context,
+            "student": student,
+            "grades": grades_by_student.get(sid, []),
+            "attendance": attendance_by_student.get(sid, []),
+        }
+
+
+def attendance_summary(months):
+    present = sum(m["present"] for m in months)
+    total = sum(m["total"] for m in months)
+    rate = present / total * 100 if total else 0.0
+    change = months[-1]["rate"] - months[0]["rate"] if len(months) > 1 else 0.0
+    if change >= TREND_THRESHOLD:
+        trend = "Improving"
+    elif change <= -TREND_THRESHOLD:
+        trend = "Declining"
+    else:
+        trend = "Steady"
+    return rate, trend
+
+
+def card_filename(student, fmt):
+    name = re.sub(r"[^A-Za-z0-9]+", "_", f"{student['last_name']}_{student['first_name']}").strip("_")
+    return f"{student['student_id']}_{name}.{fmt}"
+
+
+_template = None
+
+
+def _init_worker():
+    global _template
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True)
+    _template = env.get_template("report_card.html")
+
+
+def render_chunk(payloads, fmt):
+    # Runs in a worker process: returns (filename, bytes) for each student
+    rendered = []
+    for payload in payloads:
+        rate, trend = attendance_summary(payload["attendance"]) if payload["attendance"] else (0.0, "")
+        html = _template.render(**payload, attendance_rate=rate, attendance_trend=trend)
+        if fmt == "pdf":
+            from weasyprint import HTML
+            data = HTML(string=html).write_pdf()
+        else:
+            data = html.encode("utf-8")
+        rendered.append((card_filename(payload["student"], fmt), data))
+    return rendered
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate(start, end, out, fmt="html", workers=None, campus=None):
+    conn = create_connection(campus, role="read")
+    try:
+        students, grades, attendance = load_report_data(conn, start, end)
+    finally:
+        close_connection(conn)
+
+    total = len(students)
+    payloads = build_payloads(students, grades, attendance, start, end)
+
+    to_zip = out.lower().endswith(".zip")
+    archive = zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) if to_zip else None
+    if not to_zip:
+        os.makedirs(out, exist_ok=True)
+
+    done = 0
+    chunks = _chunks(payloads, CHUNK_SIZE)
+    limit = (workers or os.cpu_count() or 1) * CHUNKS_IN_FLIGHT
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = set()
+            while True:
+                for chunk in chunks:
+                    pending.add(pool.submit(render_chunk, chunk, fmt))
+                    if len(pending) >= limit:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    rendered = future.result()
+                    for filename, data in rendered:
+                        if archive:
+                            archive.writestr(filename, data)
+                        else:
+                            with open(os.path.join(out, filename), "wb") as f:
+                                f.write(data)
+                    done += len(rendered)
+                    print(f"\rRendered {done}/{total} report cards", end="", file=sys.stderr)
+    finally:
+        if archive:
+            archive.close()
+    print(file=sys.stderr)
+    return total
+
+
+def main():
+    def parse_date(s):
+        return datetime.strptime(s, "%Y-%m-%d").date()
+
+    parser = argparse.ArgumentParser(description="Generate report cards for every student.")
+    parser.add_argument("--start", type=parse_date, required=True, help="first day of the term (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_date, required=True, help="last day of the term (YYYY-MM-DD)")
+    parser.add_argument("--out", default="report_cards.zip", help="output .zip file or directory")
+    parser.add_argument("--format", choices=["html", "pdf"], default="html")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--campus", default=None, help="campus to run against (default: the configured default campus)")
+    args = parser.parse_args()
+
+    if args.format == "pdf" and importlib.util.find_spec("weasyprint") is None:
+        parser.error("PDF output needs the weasyprint package (pip install weasyprint)")
+
+    started = datetime.now()
+    total = generate(args.start, args.end, args.out, args.format, args.workers, args.campus)
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"Wrote {total} report cards to {args.out} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Batch job that scores every student's risk of falling behind.
+
+Pulls attendance and grades for all students in bulk, computes the score
+per student with vectorized pandas/NumPy operations and replaces the
+contents of StudentRiskScores in one transaction. Meant to be scheduled
+(cron / Windows Task Scheduler), e.g. nightly:
+
+    python risk_scoring.py --since 2024-09-01
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from attendance_streaks import ABSENT, LATE, PRESENT, current_run
+from db import create_connection, close_connection
+from queries import execute, executemany, frame
+
+
+# How much each signal contributes to the 0-100 risk score
+WEIGHTS = {"attendance": 0.5, "absence_streak": 0.2, "grade_slope": 0.3}
+
+# Absences in a row that count as the maximum streak risk
+STREAK_CAP = 5
+
+# Points lost per week that count as the maximum slope risk
+SLOPE_CAP = 2.0
+
+
+def load_facts(conn, since):
+    students = frame(conn, "students.ids")
+    # Hot and archived rows: a window that starts before the current term keeps its data
+    attendance = frame(conn, "risk.attendance_since", (since,), attendance="Attendance_History")
+    grades = frame(conn, "risk.grades_since", (since,), grades="Grades_History")
+    return students, attendance, grades
+
+
+def attendance_features(attendance):
+    if attendance.empty:
+        return pd.DataFrame(columns=["attendance_rate", "absence_streak"])
+
+    student = attendance["student_id"].to_numpy()
+    status = attendance["status"].to_numpy()
+    rate = pd.Series(status == "Present").groupby(student).mean()
+
+    # The streak counts days, not records: each day collapses to its worst
+    # status first (as in reports.day_statuses), which also makes the order of
+    # same-day rows irrelevant. The current streak is then the student's
+    # latest run of days when that run is Absent
+    days = pd.DataFrame({
+        "student_id": student,
+        "date": attendance["date"].to_numpy(),
+        "day_status": np.where(status == "Absent", ABSENT, np.where(status == "Late", LATE, PRESENT)),
+    }).groupby(["student_id", "date"], sort=True)["day_status"].max().reset_index()
+    streak = current_run(days["student_id"].to_numpy(), days["day_status"].to_numpy(), ABSENT)
+
+    return pd.DataFrame({"attendance_rate": rate, "absence_streak": streak.astype(int)})
+
+
+def grade_slopes(grades):
+    if grades.empty:
+        return pd.Series(dtype=float, name="grade_slope")
+
+    student = grades["student_id"].to_numpy()
+    weeks = pd.to_datetime(grades["date_assigned"]).to_numpy().astype("datetime64[D]").astype(np.int64) / 7.0
+    points = grades["points"].to_numpy(dtype=float)
+
+    # Least-squares slope per student: sum(dx * dy) / sum(dx^2) with x and y
+    # centred on each student's own mean
+    frame = pd.DataFrame({"x": weeks, "y": points}, index=student)
+    centred = frame - frame.groupby(level=0).transform("mean")
+    sums = pd.DataFrame({
+        "xy": centred["x"] * centred["y"],
+        "xx": centred["x"] ** 2,
+    }).groupby(level=0).sum()
+    slope = np.where(sums["xx"] > 0, sums["xy"] / sums["xx"].where(sums["xx"] > 0, 1), 0.0)
+    return pd.Series(slope, index=sums.index, name="grade_slope")
+
+
+def score_students(students, attendance, grades):
+    scores = pd.DataFrame(index=pd.Index(students["student_id"], name="student_id"))
+    scores = scores.join(attendance_features(attendance)).join(grade_slopes(grades))
+    scores["absence_streak"] = scores["absence_streak"].fillna(0).astype(int)
+    scores["grade_slope"] = scores["grade_slope"].fillna(0.0)
+
+    # Students with no attendance in the window keep a NULL rate and add no attendance risk
+    attendance_risk = (1 - scores["attendance_rate"]).fillna(0)
+    streak_risk = np.minimum(scores["absence_streak"] / STREAK_CAP, 1)
+    slope_risk = np.clip(-scores["grade_slope"] / SLOPE_CAP, 0, 1)
+
+    scores["risk_score"] = 100 * (
+        WEIGHTS["attendance"] * attendance_risk
+        + WEIGHTS["absence_streak"] * streak_risk
+        + WEIGHTS["grade_slope"] * slope_risk
+    )
+    return scores.reset_index()
+
+
+def write_scores(conn, scores, computed_at):
+    rows = [
+        (int(r.student_id),
+         None if pd.isna(r.attendance_rate) else float(r.attendance_rate),
+         int(r.absence_streak), float(r.grade_slope), float(r.risk_score), computed_at)
+        for r in scores.itertuples(index=False)
+    ]
+    try:
+        execute(conn, "risk.clear_scores")
+        if rows:
+            executemany(conn, "risk.insert_score", rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def run(since, campus=None):
+    conn = create_connection(campus)
+    try:
+        students, attendance, grades = load_facts(conn, since)
+        scores = score_students(students, attendance, grades)
+        write_scores(conn, scores, datetime.now())
+    finally:
+        close_connection(conn)
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute StudentRiskScores for all students.")
+    parser.add_argument("--since", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        default=(datetime.now() - timedelta(days=180)).date(),
+                        help="only use attendance and grades on or after this date (YYYY-MM-DD, default: 180 days ago)")
+    parser.add_argument("--campus", default=None, help="campus to run against (default: the configured default campus)")
+    args = parser.parse_args()
+
+    scores = run(args.since, args.campus)
+    print(f"Scored {len(scores)} students since {args.since}; "
+          f"{int((scores['risk_score'] >= 50).sum())} at or above 50.")
+
+
+if __name__ == "__main__":
+    main()
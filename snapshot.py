@@ -0,0 +1,222 @@
+"""Snapshot a campus database to compressed Parquet files and restore it elsewhere.
+
+A snapshot is a directory with one zstd-compressed Parquet file per table
+and a manifest. Tables are streamed in chunks (one row group per chunk), so
+memory stays flat however large the school is. Restore loads the tables in
+foreign-key order with batched inserts in a single transaction, keeping
+every ID, including the Attendance and Grades identities.
+
+    python snapshot.py create                            # snapshots/<campus>-<timestamp>
+    python snapshot.py --campus north create --out seed/north
+    python snapshot.py --campus staging restore snapshots/main-20250314-060000
+
+The five core tables come with the grade scales they need and with the
+archived terms (Terms, Attendance_Archive, Grades_Archive), so a campus
+keeps its history; risk scores, guardians and the notification log are not
+included.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from db import create_connection, close_connection
+from queries import execute, executemany, fetchone, stream
+
+
+SNAPSHOT_DIR = "snapshots"
+
+# Rows fetched, written as one row group and inserted per round trip
+CHUNK_SIZE = 50000
+
+COMPRESSION = "zstd"
+
+FORMAT_VERSION = 2
+
+# (table, catalog suffix, Arrow schema) in foreign-key order: parents first
+TABLES = [
+    ("GradeScales", "grade_scales", pa.schema([
+        ("scale_id", pa.int32()), ("scale_name", pa.string()),
+    ])),
+    ("GradeScaleBands", "grade_scale_bands", pa.schema([
+        ("scale_id", pa.int32()), ("letter", pa.string()), ("points", pa.uint8()),
+        ("min_points", pa.uint8()), ("max_points", pa.uint8()),
+    ])),
+    ("Teachers", "teachers", pa.schema([
+        ("teacher_id", pa.int32()), ("first_name", pa.string()), ("last_name", pa.string()),
+        ("subject", pa.string()),
+    ])),
+    ("Students", "students", pa.schema([
+        ("student_id", pa.int32()), ("first_name", pa.string()), ("last_name", pa.string()),
+        ("dob", pa.date32()), ("gender", pa.string()), ("enrollment_date", pa.date32()),
+    ])),
+    ("Classes", "classes", pa.schema([
+        ("class_id", pa.int32()), ("class_name", pa.string()), ("teacher_id", pa.int32()),
+    ])),
+    ("Attendance", "attendance", pa.schema([
+        ("attendance_id", pa.int32()), ("student_id", pa.int32()), ("class_id", pa.int32()),
+        ("date", pa.date32()), ("status", pa.string()), ("ip_address", pa.binary()),
+    ])),
+    ("Grades", "grades", pa.schema([
+        ("grade_id", pa.int32()), ("student_id", pa.int32()), ("class_id", pa.int32()),
+        ("scale_id", pa.int32()), ("points", pa.uint8()), ("date_assigned", pa.date32()),
+    ])),
+    ("Terms", "terms", pa.schema([
+        ("term_id", pa.int32()), ("term_name", pa.string()), ("start_date", pa.date32()),
+        ("end_date", pa.date32()), ("archived_at", pa.timestamp("us")),
+    ])),
+    ("Attendance_Archive", "attendance_archive", pa.schema([
+        ("attendance_id", pa.int32()), ("student_id", pa.int32()), ("class_id", pa.int32()),
+        ("date", pa.date32()), ("status", pa.string()), ("ip_address", pa.binary()),
+    ])),
+    ("Grades_Archive", "grades_archive", pa.schema([
+        ("grade_id", pa.int32()), ("student_id", pa.int32()), ("class_id", pa.int32()),
+        ("scale_id", pa.int32()), ("points", pa.uint8()), ("date_assigned", pa.date32()),
+    ])),
+]
+
+# Tables whose IDs are IDENTITY columns on SQL Server
+IDENTITY_TABLES = {"Attendance", "Grades"}
+
+
+def _record_batch(rows, schema, dialect):
+    columns = zip(*rows)
+    if dialect == "sqlite":
+        # SQLite returns dates as text; Arrow parses them on cast
+        arrays = [pa.array(values).cast(field.type) for values, field in zip(columns, schema)]
+    else:
+        arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _show(table, rows, start):
+    rate = rows / max(time.perf_counter() - start, 1e-9)
+    print(f"\r{table}: {rows:,} rows ({rate:,.0f} rows/s)", end="", file=sys.stderr, flush=True)
+
+
+def create_snapshot(conn, out_dir, chunk_size=CHUNK_SIZE):
+    """Write every table to `out_dir`; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    # Under SNAPSHOT isolation all tables are read as of the same moment, so the
+    # files agree with each other even while the apps keep writing
+    consistent = fetchone(conn, "snapshot.isolation")[0] == 1
+    # The isolation level can only change between transactions
+    conn.rollback()
+    if consistent:
+        execute(conn, "snapshot.begin")
+    else:
+        print("Snapshot isolation is off for this database; take the snapshot while the apps are idle, "
+              "or run ALTER DATABASE ... SET ALLOW_SNAPSHOT_ISOLATION ON", file=sys.stderr)
+
+    manifest = {"format": FORMAT_VERSION, "campus": conn.campus, "created_at": datetime.now().isoformat(),
+                "consistent": consistent, "tables": {}}
+    try:
+        for table, name, schema in TABLES:
+            start = time.perf_counter()
+            rows = 0
+            with pq.ParquetWriter(os.path.join(out_dir, f"{table}.parquet"), schema,
+                                  compression=COMPRESSION) as writer:
+                for batch in stream(conn, f"snapshot.{name}", size=chunk_size):
+                    writer.write_batch(_record_batch(batch, schema, conn.dialect))
+                    rows += len(batch)
+                    _show(table, rows, start)
+            _show(table, rows, start)
+            print(file=sys.stderr)
+            manifest["tables"][table] = rows
+    finally:
+        # Ends the read transaction
+        conn.rollback()
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _check_snapshot(snapshot_dir):
+    with open(os.path.join(snapshot_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest["format"] != FORMAT_VERSION:
+        raise ValueError(f"Snapshot format {manifest['format']} is not supported (expected {FORMAT_VERSION})")
+    for table, _, schema in TABLES:
+        found = pq.read_schema(os.path.join(snapshot_dir, f"{table}.parquet"))
+        if found.names != schema.names:
+            raise ValueError(f"{table}.parquet has columns {found.names}, expected {schema.names}")
+    return manifest
+
+
+def restore_snapshot(conn, snapshot_dir, chunk_size=CHUNK_SIZE):
+    """Load a snapshot into a database whose core tables are empty; returns rows restored per table."""
+    manifest = _check_snapshot(snapshot_dir)
+    if fetchone(conn, "restore.rows")[0]:
+        raise ValueError(f"Campus {conn.campus} already has Students, Teachers, Classes, Attendance, Grades, "
+                         "Terms or archived rows; restore into a freshly created database")
+
+    restored = {}
+    try:
+        # The schema script seeds a default grade scale; the snapshot's scales replace it
+        execute(conn, "restore.clear_grade_scale_bands")
+        execute(conn, "restore.clear_grade_scales")
+        for table, name, _ in TABLES:
+            identity = conn.dialect == "mssql" and table in IDENTITY_TABLES
+            if identity:
+                execute(conn, "restore.identity_insert_on", table=table)
+            start = time.perf_counter()
+            rows = 0
+            for batch in pq.ParquetFile(os.path.join(snapshot_dir, f"{table}.parquet")).iter_batches(chunk_size):
+                executemany(conn, f"restore.{name}", list(zip(*(column.to_pylist() for column in batch.columns))))
+                rows += batch.num_rows
+                _show(table, rows, start)
+            _show(table, rows, start)
+            print(file=sys.stderr)
+            # Only one table per session can have IDENTITY_INSERT on
+            if identity:
+                execute(conn, "restore.identity_insert_off", table=table)
+            if rows != manifest["tables"][table]:
+                raise ValueError(f"{table}.parquet has {rows} rows, the manifest says {manifest['tables'][table]}")
+            restored[table] = rows
+        # All or nothing: a failed restore leaves the target as empty as it was
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return restored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot or restore the school database.")
+    parser.add_argument("--campus", default=None, help="campus to run against (default: the configured default campus)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per fetch, row group and insert batch")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="write a snapshot of the campus database")
+    create.add_argument("--out", default=None, help=f"snapshot directory (default: {SNAPSHOT_DIR}/<campus>-<timestamp>)")
+
+    restore = commands.add_parser("restore", help="load a snapshot into an empty campus database")
+    restore.add_argument("snapshot", help="snapshot directory")
+
+    args = parser.parse_args()
+
+    conn = create_connection(args.campus)
+    start = time.perf_counter()
+    try:
+        if args.command == "create":
+            out_dir = args.out or os.path.join(SNAPSHOT_DIR, f"{conn.campus}-{datetime.now():%Y%m%d-%H%M%S}")
+            counts = create_snapshot(conn, out_dir, args.chunk_size)["tables"]
+            summary = f"Snapshot of {conn.campus} written to {out_dir}"
+        else:
+            counts = restore_snapshot(conn, args.snapshot, args.chunk_size)
+            summary = f"Restored {args.snapshot} into {conn.campus}"
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        close_connection(conn)
+    print(f"{summary}: {sum(counts.values()):,} rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()